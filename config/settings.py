@@ -109,7 +109,19 @@ CACHES = {
         },
         "KEY_PREFIX": "example",
         "TIMEOUT": 60 * 30,
-    }
+    },
+    # responses from IEX, timeouts are set by crawler classes. Its own DB,
+    # so clearing it does not flush quotes, news and rate limiter
+    "iex": {
+        "BACKEND": "django_redis.cache.RedisCache",
+        "LOCATION": config('IEX_CACHE_URL', default='redis://localhost:6379/2'),
+        "OPTIONS": {
+            "CLIENT_CLASS": "django_redis.client.DefaultClient",
+            "COMPRESSOR": "django_redis.compressors.zlib.ZlibCompressor",
+        },
+        "KEY_PREFIX": "iex",
+        "TIMEOUT": None,
+    },
 }
 
 # Password validation
@@ -192,6 +204,14 @@ CELERY_ACCEPT_CONTENT = ['application/json']
 CELERY_TASK_SERIALIZER = 'json'
 CELERY_RESULT_SERIALIZER = 'json'
 
+# periodic refresh jobs are split into chunks run as separate tasks
+QUOTES_CHUNK_SIZE = config('QUOTES_CHUNK_SIZE', default=100, cast=int)
+PORTFOLIOS_CHUNK_SIZE = config('PORTFOLIOS_CHUNK_SIZE', default=50, cast=int)
+
+# quotes are written to Redis in pipelines of QUOTES_BATCH_SIZE commands and
+# expire QUOTES_TIMEOUT seconds after the last update
+QUOTES_BATCH_SIZE = config('QUOTES_BATCH_SIZE', default=500, cast=int)
+QUOTES_TIMEOUT = config('QUOTES_TIMEOUT', default=60 * 60, cast=int)
 
 CELERY_BEAT_SCHEDULE = {
     'hello': {
@@ -203,8 +223,26 @@ CELERY_BEAT_SCHEDULE = {
         'task': 'my_wallet.stocks.tasks.update_stock_price',
         'schedule': crontab(minute='05', hour='19')
     },
+
+    'sync_prices_history': {
+        'task': 'my_wallet.stocks.tasks.sync_prices_history',
+        'schedule': crontab(minute='35', hour='19')
+    },
+
+    'refresh_all_news': {
+        'task': 'my_wallet.stocks.tasks.refresh_all_news',
+        'schedule': crontab(minute='15')
+    },
 }
 
+# news are kept in cache for NEWS_TIMEOUT seconds and refreshed when
+# they are older than NEWS_FRESH seconds
+NEWS_TIMEOUT = config('NEWS_TIMEOUT', default=60 * 60 * 24, cast=int)
+NEWS_FRESH = config('NEWS_FRESH', default=60 * 60, cast=int)
+NEWS_LOCK_TIMEOUT = config('NEWS_LOCK_TIMEOUT', default=60 * 5, cast=int)
+# max time (seconds) of scraping all news sources
+NEWS_DEADLINE = config('NEWS_DEADLINE', default=5, cast=float)
+
 
 # for gmail
 EMAIL_USE_TLS = True
@@ -214,6 +252,27 @@ EMAIL_HOST_PASSWORD = config('EMAIL_PASSWORD', default='secret_password')
 EMAIL_PORT = 587
 
 IEX_API_KEY = config('IEX_API_KEY', default=string.ascii_letters)
+# e.g. http://127.0.0.1:8001 for local stand-in server (manage.py iex_standin)
+IEX_BASE_URL = config('IEX_BASE_URL', default='https://cloud.iexapis.com/stable')
+
+# shared HTTP session used by crawlers (connections kept alive per process)
+HTTP_POOL_SIZE = config('HTTP_POOL_SIZE', default=10, cast=int)
+HTTP_TIMEOUT = config('HTTP_TIMEOUT', default=10, cast=float)
+
+# count IEX cache hits and misses (one more Redis command per request)
+IEX_CACHE_STATS = config('IEX_CACHE_STATS', default=False, cast=bool)
+
+# max number of concurrent IEX requests when many stocks are added at once
+IEX_MAX_WORKERS = config('IEX_MAX_WORKERS', default=8, cast=int)
+
+# token bucket shared by all workers: tokens per second, max tokens and
+# how long (seconds) a call can wait for tokens. IEX_RATE_LIMIT=0 disables it
+IEX_RATE_LIMIT = config('IEX_RATE_LIMIT', default=50, cast=float)
+IEX_RATE_BURST = config('IEX_RATE_BURST', default=100, cast=float)
+IEX_RATE_MAX_WAIT = config('IEX_RATE_MAX_WAIT', default=5, cast=float)
+
+# number of rows saved by one INSERT in bulk_create
+BULK_BATCH_SIZE = config('BULK_BATCH_SIZE', default=500, cast=int)
 
 
 # DEBUG settings
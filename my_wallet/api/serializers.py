@@ -1,9 +1,9 @@
 from rest_framework.serializers import (
-    HyperlinkedIdentityField, ModelSerializer, SerializerMethodField,
+    CharField, HyperlinkedIdentityField, ModelSerializer, SerializerMethodField,
 )
 
 from my_wallet.portfolio.models import Portfolio
-from my_wallet.stocks.models import Stocks
+from my_wallet.stocks.models import Prices, Stocks
 
 
 class PortfolioListSerializer(ModelSerializer):
@@ -76,3 +76,45 @@ class StocksListSerializer(ModelSerializer):
             'name',
             'ticker',
         )
+
+
+class StocksReturnsSerializer(ModelSerializer):
+    date = SerializerMethodField()
+    price = SerializerMethodField()
+    returns = SerializerMethodField()
+
+    class Meta:
+        model = Stocks
+        fields = (
+            'ticker',
+            'date',
+            'price',
+            'returns',
+        )
+
+    def get_date(self, obj):
+        return obj.end_date
+
+    def get_price(self, obj):
+        return obj.end_price
+
+    def get_returns(self, obj):
+        return {
+            horizon: {
+                'start_price': getattr(obj, 'start_' + horizon),
+                'percent': getattr(obj, 'return_' + horizon),
+            }
+            for horizon in self.context['horizons']
+        }
+
+
+class PricesAsOfSerializer(ModelSerializer):
+    ticker = CharField(source='stock.ticker')
+
+    class Meta:
+        model = Prices
+        fields = (
+            'ticker',
+            'date_price',
+            'price',
+        )
@@ -0,0 +1,91 @@
+from datetime import date
+
+from django.test import TestCase
+from django.urls import reverse
+
+from my_wallet.profiles.models import Profile
+from my_wallet.stocks.models import Prices, Stocks
+
+
+class StocksReturnsAPIViewTest(TestCase):
+    def setUp(self):
+        self.user = Profile.objects.create_user(username='Tester', password='Tester123')
+        self.client.login(username='Tester', password='Tester123')
+        self.url = reverse('api:stocks_returns')
+        for ticker, prices in [('AAPL', [100, 110]), ('AMZN', [50, 45]), ('IBM', [10, 10])]:
+            stock = Stocks.objects.create(name=ticker, ticker=ticker)
+            Prices.objects.create(stock=stock, price=prices[0], date_price=date(2019, 1, 2))
+            Prices.objects.create(stock=stock, price=prices[1], date_price=date(2019, 2, 4))
+
+    def test_returns(self):
+        params = {'tickers': 'aapl,AMZN', 'horizons': '1d,1m', 'date': '2019-02-05'}
+        with self.assertNumQueries(3):  # session, user and returns
+            response = self.client.get(self.url, params)
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertEqual([row['ticker'] for row in data], ['AAPL', 'AMZN'])
+        self.assertEqual(data[0]['date'], '2019-02-04')
+        self.assertAlmostEqual(data[0]['returns']['1m']['percent'], 10)
+        self.assertAlmostEqual(data[1]['returns']['1d']['percent'], -10)
+
+    def test_default_horizons(self):
+        response = self.client.get(self.url)
+        self.assertEqual(len(response.json()), 3)
+        self.assertEqual(list(response.json()[0]['returns']), ['1d', '1w', '1m', 'ytd', '1y'])
+
+    def test_invalid_params(self):
+        response = self.client.get(self.url, {'horizons': '1m,2d'})
+        self.assertEqual(response.status_code, 400)
+        response = self.client.get(self.url, {'date': '2019-13-01'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_date_out_of_calendar(self):
+        for value in ['1975-01-01', '2070-01-01']:
+            response = self.client.get(self.url, {'date': value})
+            self.assertEqual(response.status_code, 400)
+            self.assertIn('date', response.json())
+
+    def test_horizon_before_calendar(self):
+        response = self.client.get(self.url, {'date': '1984-06-01', 'horizons': '5y'})
+        self.assertEqual(response.status_code, 200)
+        self.assertIsNone(response.json()[0]['returns']['5y']['percent'])
+
+    def test_login_required(self):
+        self.client.logout()
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 403)
+
+
+class PricesAsOfAPIViewTest(TestCase):
+    def setUp(self):
+        Profile.objects.create_user(username='Tester', password='Tester123')
+        self.client.login(username='Tester', password='Tester123')
+        self.url = reverse('api:prices_as_of')
+        apple = Stocks.objects.create(name='Apple', ticker='AAPL')
+        amazon = Stocks.objects.create(name='Amazon', ticker='AMZN')
+        Prices.objects.create(stock=apple, price=100, date_price=date(2019, 1, 2))
+        Prices.objects.create(stock=apple, price=110, date_price=date(2019, 1, 4))
+        Prices.objects.create(stock=amazon, price=50, date_price=date(2019, 1, 3))
+
+    def test_as_of(self):
+        with self.assertNumQueries(3):  # session, user and prices
+            response = self.client.get(self.url, {'date': '2019-01-03'})
+        expected = [
+            {'ticker': 'AAPL', 'date_price': '2019-01-02', 'price': '100.00'},
+            {'ticker': 'AMZN', 'date_price': '2019-01-03', 'price': '50.00'},
+        ]
+        self.assertEqual(response.json(), expected)
+
+    def test_tickers(self):
+        response = self.client.get(self.url, {'tickers': 'aapl'})
+        self.assertEqual(response.json(), [
+            {'ticker': 'AAPL', 'date_price': '2019-01-04', 'price': '110.00'},
+        ])
+
+    def test_date_out_of_calendar(self):
+        response = self.client.get(self.url, {'date': '2070-01-01'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_no_prices(self):
+        response = self.client.get(self.url, {'date': '2018-01-01'})
+        self.assertEqual(response.json(), [])
@@ -2,8 +2,9 @@ from django.urls import include, path
 
 from .views import (
     PortfolioCreateAPIView, PortfolioListAPIView,
-    PortfolioRetrieveUpdateDeleteAPIView, StocksCreateAPIView,
+    PortfolioRetrieveUpdateDeleteAPIView, PricesAsOfAPIView, StocksCreateAPIView,
     StocksListAPIView, StocksRetrieveUpdateDestroyAPIView,
+    StocksReturnsAPIView,
 )
 
 app_name = 'api'
@@ -14,6 +15,8 @@ urlpatterns = [
 
     path('stocks/', StocksListAPIView.as_view(), name='stocks'),
     path('stocks/create', StocksCreateAPIView.as_view(), name='stocks_create'),
+    path('stocks/returns/', StocksReturnsAPIView.as_view(), name='stocks_returns'),
     path('stocks/<slug:ticker>/', StocksRetrieveUpdateDestroyAPIView.as_view(), name='stocks_details'),
 
+    path('prices/as-of/', PricesAsOfAPIView.as_view(), name='prices_as_of'),
 ]
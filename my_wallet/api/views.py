@@ -1,3 +1,7 @@
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+
+from rest_framework.exceptions import ValidationError
 from rest_framework.filters import OrderingFilter, SearchFilter
 from rest_framework.generics import (
     CreateAPIView, DestroyAPIView, ListAPIView, RetrieveAPIView,
@@ -8,15 +12,17 @@ from rest_framework.permissions import (
 )
 
 from my_wallet.portfolio.models import Portfolio
-from my_wallet.stocks.models import Stocks
+from my_wallet.stocks.models import HORIZONS, Prices, Stocks
+from my_wallet.stocks.trading_calendar import calendar
 from my_wallet.stocks.utils import StockMaker
 
 from .paginations import StandardPagePagination
 from .permissions import IsOwnerOrReadOnly
 from .serializers import (
-    PortfolioCreateSerializer, PortfolioListSerializer,
+    PortfolioCreateSerializer, PortfolioListSerializer, PricesAsOfSerializer,
     PortfolioRetrieveUpdateDeleteSerializer, StocksCreateUpdateSerializer,
     StocksListSerializer, StocksRetrieveUpdateDeleteSerializer,
+    StocksReturnsSerializer,
 )
 
 
@@ -73,3 +79,69 @@ class StocksListAPIView(ListAPIView):
     pagination_class = StandardPagePagination
     filter_backends = [SearchFilter, OrderingFilter]
     search_fields = ['ticker', 'name']
+
+
+def get_date_param(request, name='date'):
+    value = request.query_params.get(name)
+    if not value:
+        return None
+    try:
+        date = parse_date(value)
+    except ValueError:
+        date = None
+    if date is None:
+        raise ValidationError({name: 'Date has to be in YYYY-MM-DD format.'})
+    if not calendar.first_day <= date <= calendar.last_day:
+        raise ValidationError({
+            name: f'Date has to be between {calendar.first_day} and {calendar.last_day}.'
+        })
+    return date
+
+
+class StocksReturnsAPIView(ListAPIView):
+    """
+    Returns of many stocks calculated with one query.
+    Params: tickers=AAPL,MSFT (default all), horizons=1d,1m,1y, date=YYYY-MM-DD
+    """
+    serializer_class = StocksReturnsSerializer
+    permission_classes = [IsAuthenticated, ]
+    default_horizons = ['1d', '1w', '1m', 'ytd', '1y']
+
+    def get_horizons(self):
+        horizons = self.request.query_params.get('horizons')
+        if not horizons:
+            return self.default_horizons
+        horizons = horizons.split(',')
+        unknown = [h for h in horizons if h not in HORIZONS and h not in ('1d', 'ytd')]
+        if unknown:
+            raise ValidationError({'horizons': f'Unknown horizons: {", ".join(unknown)}'})
+        return horizons
+
+    def get_queryset(self):
+        queryset = Stocks.objects.with_returns(
+            self.get_horizons(), get_date_param(self.request))
+        tickers = self.request.query_params.get('tickers')
+        if tickers:
+            queryset = queryset.filter(ticker__in=tickers.upper().split(','))
+        return queryset
+
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        context['horizons'] = self.get_horizons()
+        return context
+
+
+class PricesAsOfAPIView(ListAPIView):
+    """
+    The last price on or before the date of every stock, e.g. for backtests.
+    Params: date=YYYY-MM-DD (default today), tickers=AAPL,MSFT (default all)
+    """
+    serializer_class = PricesAsOfSerializer
+    permission_classes = [IsAuthenticated, ]
+
+    def get_queryset(self):
+        date = get_date_param(self.request) or timezone.now().date()
+        tickers = self.request.query_params.get('tickers')
+        if tickers:
+            tickers = tickers.upper().split(',')
+        return Prices.objects.as_of_all(date, tickers)
@@ -0,0 +1,17 @@
+# Generated by Django 2.2.28 on 2026-10-18 09:09
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('portfolio', '0005_auto_20190714_0144'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='transaction',
+            index=models.Index(fields=['portfolio', 'date'], name='transaction_portfolio_date_idx'),
+        ),
+    ]
@@ -147,6 +147,9 @@ class Transaction(models.Model):
     class Meta:
 
         ordering = ('-date',)
+        indexes = [
+            models.Index(fields=['portfolio', 'date'], name='transaction_portfolio_date_idx'),
+        ]
 
     @property
     def cost(self):
@@ -1,31 +1,81 @@
 # Create your tasks here
 from __future__ import absolute_import, unicode_literals
+import logging
 
-from django.core.cache import cache
+from django.conf import settings
 
-from celery import shared_task
+import requests
+from celery import chord, shared_task
 
-from my_wallet.stocks.crawler import QuotesIEX
+from my_wallet.stocks.crawler import BatchQuotesIEX, chunked
 from my_wallet.stocks.models import Stocks
+from my_wallet.stocks.quotes import make_quote, quote_store
+from my_wallet.stocks.ratelimit import RateLimitExceeded
 
 from my_wallet.portfolio.models import Portfolio, PastPortfolio
 
 
 @shared_task
 def price_update():
-    for stock in Stocks.objects.all():
-        data = QuotesIEX(stock.ticker).get_data()
-        cache.set(stock.ticker + '_price', data.get('latestPrice', 'no data'))
-        cache.set(stock.ticker + '_day_change', data.get('change', 'no data'))
-        cache.set(stock.ticker + '_percent_change', data.get('changePercent', 'no data') * 100)
-        cache.set(stock.ticker + '_day_low', data.get('low', 'no data'))
-        cache.set(stock.ticker + '_day_high', data.get('high', 'no data'))
-        print(f'{stock.ticker} updated successfully')
+    # every chunk is a separate task, so chunks run on all workers
+    tickers = Stocks.objects.values_list('ticker', flat=True)
+    chunks = list(chunked(tickers, settings.QUOTES_CHUNK_SIZE))
+    if not chunks:
+        return
+    header = [price_update_chunk.s(chunk, i, len(chunks)) for i, chunk in enumerate(chunks, start=1)]
+    chord(header)(price_update_done.s())
 
-    print('I have finished')
+
+@shared_task(bind=True, max_retries=3)
+def price_update_chunk(self, tickers, number=1, total=1):
+    # chunk which could not be downloaded is logged and counted as not
+    # updated, so price_update_done always runs
+    try:
+        quotes = BatchQuotesIEX(tickers).get_data()
+    except RateLimitExceeded as e:
+        if self.request.retries < self.max_retries:
+            raise self.retry(countdown=e.retry_after)
+        logging.error(f'Quotes chunk {number}/{total} failed: {e}')
+        quotes = {}
+    except (ValueError, requests.RequestException) as e:
+        logging.error(f'Quotes chunk {number}/{total} failed: {e}')
+        quotes = {}
+    quote_store.set_many({ticker: make_quote(data) for ticker, data in quotes.items()})
+    logging.info(f'Quotes chunk {number}/{total}: updated {len(quotes)} of {len(tickers)} stocks')
+    return {'requested': len(tickers), 'updated': len(quotes)}
+
+
+@shared_task
+def price_update_done(results):
+    requested = sum(result['requested'] for result in results)
+    updated = sum(result['updated'] for result in results)
+    logging.info(f'Quotes updated for {updated} of {requested} stocks in {len(results)} chunks')
+    return {'requested': requested, 'updated': updated}
 
 
 @shared_task
 def update_portfolio_history():
-    for portfolio in Portfolio.objects.all():
+    ids = Portfolio.objects.values_list('pk', flat=True)
+    chunks = list(chunked(ids, settings.PORTFOLIOS_CHUNK_SIZE))
+    if not chunks:
+        return
+    header = [
+        update_portfolio_history_chunk.s(chunk, i, len(chunks))
+        for i, chunk in enumerate(chunks, start=1)
+    ]
+    chord(header)(update_portfolio_history_done.s())
+
+
+@shared_task
+def update_portfolio_history_chunk(ids, number=1, total=1):
+    portfolios = Portfolio.objects.filter(pk__in=ids)
+    for portfolio in portfolios:
         portfolio.make_past_portfolio()
+    logging.info(f'Portfolios chunk {number}/{total}: {len(portfolios)} portfolios saved')
+    return len(portfolios)
+
+
+@shared_task
+def update_portfolio_history_done(results):
+    logging.info(f'History saved for {sum(results)} portfolios in {len(results)} chunks')
+    return sum(results)
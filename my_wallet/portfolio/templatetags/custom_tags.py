@@ -1,12 +1,17 @@
+from decimal import Decimal
+
 from django import template
 from django.utils.html import format_html
 
 register = template.Library()
 
+# quotes and changes can be 'no data', such values are shown as they are
+NUMBERS = (int, float, Decimal)
+
 
 @register.filter
 def color_field(value):
-    if value:
+    if value and isinstance(value, NUMBERS):
         value = round(value, 2)
         if value < 0:
             return format_html(f'<span class=falling>{value}USD</span>')
@@ -17,7 +22,9 @@ def color_field(value):
 
 @register.filter
 def color_percent(value, digits):
-    value = round(value, digits) if value else value
+    if not isinstance(value, NUMBERS):
+        return value
+    value = round(value, digits)
     if value:
         if value < 0:
             return format_html(f'<span class=falling>{value}%</span>')
@@ -35,17 +35,17 @@ class PortfolioModelTest(TestCase):
     def test_str(self):
         self.assertEqual(self.portfolio.__str__(), 'Test Portfolio')
 
-    @mock.patch('my_wallet.stocks.models.cache')
-    def test_stocks_and_total_value(self, price_cache):
-        price_cache.get.return_value = 120
+    @mock.patch('my_wallet.stocks.models.quote_store')
+    def test_stocks_and_total_value(self, mock_quotes):
+        mock_quotes.get.return_value = {'price': 120}
         expected = 120 * 5 + 120 * 10
         self.assertEqual(self.portfolio.stocks_value, expected)
         expected = expected + self.portfolio.cash
         self.assertEqual(self.portfolio.total_value, expected)
 
-    @mock.patch('my_wallet.stocks.models.cache')
-    def test_get_summary(self, price_cache):
-        price_cache.get.return_value = 120
+    @mock.patch('my_wallet.stocks.models.quote_store')
+    def test_get_summary(self, mock_quotes):
+        mock_quotes.get.return_value = {'price': 120}
         expected = {
             'stocks_value': 1800, 'total_value': Decimal('2800'),
             'total_return': Decimal('-7200'),
@@ -105,9 +105,9 @@ class PortfolioModelTest(TestCase):
         self.assertTrue(self.portfolio.has_transactions())
     """
 
-    @mock.patch('my_wallet.stocks.models.cache')
+    @mock.patch('my_wallet.stocks.models.quote_store')
     def test_make_past_portfolio(self, price_cash):
-        price_cash.get.return_value = 120
+        price_cash.get.return_value = {'price': 120}
         self.portfolio.make_past_portfolio()
         past_portfolio = PastPortfolio.objects.filter(portfolio=self.portfolio)
         self.assertTrue(past_portfolio.exists())
@@ -1,30 +1,72 @@
-from django.test import TestCase
+from django.test import TestCase, override_settings
 from unittest import mock
 
-from my_wallet.portfolio.tasks import price_update, update_portfolio_history
+import requests
+
+from my_wallet.portfolio.models import Portfolio, PastPortfolio
+from my_wallet.portfolio.tasks import (
+    price_update, price_update_chunk, price_update_done,
+    update_portfolio_history, update_portfolio_history_chunk,
+)
+from my_wallet.profiles.models import Profile
 from my_wallet.stocks.models import Stocks
 
 
 class TasksTest(TestCase):
-    @mock.patch('my_wallet.portfolio.tasks.cache')
-    @mock.patch('my_wallet.portfolio.tasks.QuotesIEX.get_data')
-    def test_price_update(self, mock_quotes, mock_cache):
+    @mock.patch('my_wallet.portfolio.tasks.quote_store')
+    @mock.patch('my_wallet.portfolio.tasks.BatchQuotesIEX.get_data')
+    def test_price_update(self, mock_quotes, mock_store):
         Stocks.objects.create(name='Apple', ticker='AAPL')
         data = {
             'latestPrice': 100, 'change': 10,
-            'changePercent': -0.01, 'low': None,
-            'high': 110
+            'changePercent': -0.01, 'high': 110
         }
-        options = {}
-        mock_quotes.return_value.get = lambda key, default: data.get(key) or default
-        mock_cache.set = lambda key, value: options.update({key: value})
-        price_update()
+        mock_quotes.return_value = {'AAPL': data}
+        actual = price_update_chunk(['AAPL'])
+        self.assertEqual(actual, {'requested': 1, 'updated': 1})
         expected = {
-            'AAPL_price': 100, 'AAPL_day_change': 10,
-            'AAPL_percent_change': -1, 'AAPL_day_low': 'no data',
-            'AAPL_day_high': 110
+            'price': 100, 'day_change': 10,
+            'percent_change': -1, 'day_low': 'no data',
+            'day_high': 110
         }
-        self.assertDictEqual(options, expected)
+        mock_store.set_many.assert_called_once_with({'AAPL': expected})
+
+    @mock.patch('my_wallet.portfolio.tasks.quote_store')
+    @mock.patch('my_wallet.portfolio.tasks.BatchQuotesIEX.get_data')
+    def test_price_update_chunk_error(self, mock_quotes, mock_store):
+        for error in [ValueError('bad response'), requests.Timeout('timeout')]:
+            mock_quotes.side_effect = error
+            actual = price_update_chunk(['AAPL', 'AMZN'])
+            self.assertEqual(actual, {'requested': 2, 'updated': 0})
+
+    @override_settings(QUOTES_CHUNK_SIZE=2)
+    @mock.patch('my_wallet.portfolio.tasks.chord')
+    def test_price_update_chunks(self, mock_chord):
+        for ticker in ['AAPL', 'AMZN', 'IBM']:
+            Stocks.objects.create(name=ticker, ticker=ticker)
+        price_update()
+        header = mock_chord.call_args[0][0]
+        self.assertEqual([task.args for task in header], [
+            (['AAPL', 'AMZN'], 1, 2), (['IBM'], 2, 2)
+        ])
+
+    @mock.patch('my_wallet.portfolio.tasks.chord')
+    def test_price_update_no_stocks(self, mock_chord):
+        price_update()
+        mock_chord.assert_not_called()
+
+    def test_price_update_done(self):
+        results = [{'requested': 100, 'updated': 99}, {'requested': 5, 'updated': 5}]
+        self.assertEqual(price_update_done(results), {'requested': 105, 'updated': 104})
+
+    @mock.patch('my_wallet.portfolio.tasks.chord')
+    def test_update_portfolio_history(self, mock_chord):
+        profile = Profile.objects.create_user(username='Tester', password='Tester123')
+        portfolio = Portfolio.objects.create(
+            name='Test', profile=profile, beginning_cash=1000, cash=1000)
+        update_portfolio_history()
+        header = mock_chord.call_args[0][0]
+        self.assertEqual(header[0].args, ([portfolio.pk], 1, 1))
 
-    def test_update_portfolio_history(self):
-        pass
\ No newline at end of file
+        self.assertEqual(update_portfolio_history_chunk([portfolio.pk]), 1)
+        self.assertEqual(PastPortfolio.objects.get().cash, 1000)
\ No newline at end of file
@@ -46,9 +46,9 @@ class PortfolioViewTests(TestCase):
         response = self.client.post(url, data)
         self.assertEqual(response.status_code, 302)
 
-    @mock.patch('my_wallet.stocks.models.cache')
-    def test_portfolio_details(self, price_cache):
-        price_cache.get.return_value = 110
+    @mock.patch('my_wallet.stocks.models.quote_store')
+    def test_portfolio_details(self, mock_quotes):
+        mock_quotes.get.return_value = {'price': 110}
         url = reverse('portfolio:details', kwargs={'pk': self.portfolio.id})
         response = self.client.get(url)
         self.assertEqual(response.status_code, 200)
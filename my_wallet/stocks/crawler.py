@@ -1,12 +1,139 @@
+import codecs
+import datetime
+import hashlib
+import json
+import os
 import re
-from config.settings import IEX_API_KEY
+import tempfile
+from concurrent.futures import ThreadPoolExecutor, wait
+from config.settings import HTTP_POOL_SIZE, HTTP_TIMEOUT, IEX_API_KEY, IEX_BASE_URL
 from abc import ABC, abstractmethod
 from json.decoder import JSONDecodeError
 import requests
-from bs4 import BeautifulSoup
+from bs4 import BeautifulSoup, SoupStrainer
+from django.conf import settings
+from django.core.cache import caches
+from requests.adapters import HTTPAdapter
+
+from .ratelimit import RateLimitExceeded, iex_limiter, parse_retry_after
+from .trading_calendar import calendar
+
+_session = None
+_session_pid = None
+
+
+def get_session():
+    """
+    Function returns process-wide requests.Session. Connections are kept
+    alive and reused between calls (also between Celery tasks run by the
+    same worker). Session is recreated after fork, so child processes
+    never share sockets with the parent.
+    :return: requests.Session
+    """
+    global _session, _session_pid
+    if _session is None or _session_pid != os.getpid():
+        session = requests.Session()
+        adapter = HTTPAdapter(
+            pool_connections=HTTP_POOL_SIZE, pool_maxsize=HTTP_POOL_SIZE)
+        session.mount('https://', adapter)
+        session.mount('http://', adapter)
+        session.headers.update({'Accept-Encoding': 'gzip, deflate'})
+        _session, _session_pid = session, os.getpid()
+    return _session
+
+
+def count_cache(name):
+    if not settings.IEX_CACHE_STATS:
+        return
+    iex_cache = caches['iex']
+    iex_cache.add(name, 0, None)
+    iex_cache.incr(name)
+
+
+def get_response_key(url):
+    return 'response_' + hashlib.md5(url.encode()).hexdigest()
+
+
+def get_cache_stats():
+    """
+    Function returns numbers of IEX responses read from cache (hits)
+    and downloaded (misses). Counters are shared by all processes and
+    work only with IEX_CACHE_STATS.
+    :return: format {'hits': int, 'misses': int}
+    """
+    stats = caches['iex'].get_many(['hits', 'misses'])
+    return {'hits': stats.get('hits', 0), 'misses': stats.get('misses', 0)}
+
+
+def iter_json_array(chunks):
+    """
+    Generator decodes JSON array incrementally and yields its items one by
+    one, so the whole array is never kept in memory.
+    :param chunks: iterable of bytes with JSON array
+    :return: generator of array items
+    """
+    decoder = json.JSONDecoder()
+    text_decoder = codecs.getincrementaldecoder('utf-8')()
+    buffer = ''
+    started = finished = False
+    chunks = iter(chunks)
+    while not finished:
+        chunk = next(chunks, None)
+        finished = chunk is None
+        buffer += text_decoder.decode(chunk or b'', final=finished)
+        pos = 0
+        while True:
+            while pos < len(buffer) and (buffer[pos].isspace() or (started and buffer[pos] == ',')):
+                pos += 1
+            if pos == len(buffer):
+                break
+            if not started:
+                if buffer[pos] != '[':
+                    raise ValueError('Something is wrong with request')
+                started = True
+                pos += 1
+                continue
+            if buffer[pos] == ']':
+                return
+            try:
+                item, end = decoder.raw_decode(buffer, pos)
+            except JSONDecodeError:
+                if finished:
+                    raise ValueError('Something is wrong with request')
+                break
+            if end == len(buffer) and not finished:
+                # number at the end of buffer can be incomplete
+                break
+            yield item
+            pos = end
+        buffer = buffer[pos:]
+    raise ValueError('Something is wrong with request')
+
+
+def read_chunks(file, size=64 * 1024):
+    while True:
+        chunk = file.read(size)
+        if not chunk:
+            return
+        yield chunk
+
+
+def chunked(items, size):
+    chunk = []
+    for item in items:
+        chunk.append(item)
+        if len(chunk) == size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
 
 
 class BaseIEX(ABC):
+    # how long (in seconds) response is cached. None - response is not cached
+    cache_timeout = None
+    # number of rate limiter tokens one request costs
+    weight = 1
 
     def __init__(self, ticker):
         self.url = self.get_url(ticker)
@@ -16,7 +143,37 @@ class BaseIEX(ABC):
         pass
 
     def get_data(self):
-        response = requests.get(self.url)
+        return self.fetch(self.url)
+
+    def fetch(self, url):
+        if self.cache_timeout is None:
+            return self.download(url)
+        iex_cache = caches['iex']
+        key = get_response_key(url)
+        data = iex_cache.get(key)
+        if data is not None:
+            count_cache('hits')
+            return data
+        count_cache('misses')
+        response = self.request(url)
+        data = self.decode(response)
+        # errors and empty payloads are not kept for the whole timeout
+        if response.status_code == 200 and data:
+            iex_cache.set(key, data, self.cache_timeout)
+        return data
+
+    def request(self, url, stream=False):
+        iex_limiter.acquire(self.weight)
+        response = get_session().get(url, timeout=HTTP_TIMEOUT, stream=stream)
+        if response.status_code == 429:
+            raise RateLimitExceeded(parse_retry_after(response.headers.get('Retry-After')))
+        return response
+
+    def download(self, url):
+        return self.decode(self.request(url))
+
+    @staticmethod
+    def decode(response):
         try:
             data = response.json()
         except JSONDecodeError:
@@ -26,47 +183,182 @@ class BaseIEX(ABC):
 
 class QuotesIEX(BaseIEX):
     def get_url(self, ticker):
-        return f'https://cloud.iexapis.com/stable/stock/{ticker}/book?token={IEX_API_KEY}'
+        return f'{IEX_BASE_URL}/stock/{ticker}/book?token={IEX_API_KEY}'
 
     def get_data(self):
         data = super().get_data()
         return data.get('quote', '')
 
 
+class BatchIEX(BaseIEX):
+    """
+    Data of one :types: for many tickers at once. IEX batch endpoint accepts
+    up to :batch_size: symbols so tickers are split into chunks and one
+    request is made per chunk.
+    :return: format {'ticker': data, ...}
+    """
+    batch_size = 100
+    types = None
+    weight = 5
+
+    def __init__(self, tickers):
+        self.tickers = list(tickers)
+
+    def get_url(self, tickers):
+        symbols = ','.join(tickers)
+        return f'{IEX_BASE_URL}/stock/market/batch?symbols={symbols}&types={self.types}&token={IEX_API_KEY}'
+
+    def get_chunks(self):
+        for i in range(0, len(self.tickers), self.batch_size):
+            yield self.tickers[i:i + self.batch_size]
+
+    def get_data(self):
+        results = {}
+        for chunk in self.get_chunks():
+            data = self.fetch(self.get_url(chunk))
+            for ticker, values in data.items():
+                results[ticker] = values.get(self.types, {})
+        return results
+
+
+class BatchQuotesIEX(BatchIEX):
+    types = 'quote'
+
+
+class BatchPreviousIEX(BatchIEX):
+    # the last end-of-day bar
+    types = 'previous'
+
+
 class CompanyIEX(BaseIEX):
+    cache_timeout = 60 * 60 * 24 * 7
+
     def get_url(self, ticker):
-        return f'https://cloud.iexapis.com/stable/stock/{ticker}/company?token={IEX_API_KEY}'
+        return f'{IEX_BASE_URL}/stock/{ticker}/company?token={IEX_API_KEY}'
 
 
 class PastIEX(BaseIEX):
-    def get_url(self, ticker, num=5):
-        return f'https://cloud.iexapis.com/stable/stock/{ticker}/chart/{num}y?token={IEX_API_KEY}'
+    # IEX chart ranges from the shortest one with rate limiter weights
+    ranges = {'5d': 1, '1m': 2, '3m': 3, 'ytd': 5, '1y': 5, '5y': 10}
+
+    def __init__(self, ticker, chart_range='5y'):
+        self.url = self.get_url(ticker, chart_range)
+        self.weight = self.ranges[chart_range]
+
+    def get_url(self, ticker, chart_range='5y'):
+        return f'{IEX_BASE_URL}/stock/{ticker}/chart/{chart_range}?token={IEX_API_KEY}'
+
+    def iter_chunks(self, size, file=None):
+        """
+        Method yields prices in lists of :size: elements. Response is
+        decoded while it is downloaded (or read from :file: made by
+        get_file), so memory does not depend on length of the history.
+        """
+        if file is not None:
+            yield from chunked(iter_json_array(read_chunks(file)), size)
+            return
+        with self.request(self.url, stream=True) as response:
+            yield from chunked(iter_json_array(response.iter_content(64 * 1024)), size)
+
+    def get_file(self):
+        # response body is kept in a temporary file instead of memory
+        file = tempfile.SpooledTemporaryFile(max_size=1024 * 1024)
+        with self.request(self.url, stream=True) as response:
+            for chunk in response.iter_content(64 * 1024):
+                file.write(chunk)
+        file.seek(0)
+        return file
+
+    @staticmethod
+    def get_range(last_date, today):
+        """
+        Method finds the shortest chart range which has all prices after
+        :last_date:. Ranges are compared with the number of trading
+        sessions after :last_date: up to :today:.
+        :param last_date: date of the last saved price or None: date
+        :param today: date
+        :return: str
+        """
+        if last_date is None or last_date < calendar.first_day:
+            return '5y'
+        day = datetime.timedelta(days=1)
+        sessions = calendar.count_sessions(last_date + day, today + day)
+        if sessions <= 5:
+            return '5d'
+        elif sessions <= 20:
+            return '1m'
+        elif sessions <= 62:
+            return '3m'
+        elif last_date.year == today.year:
+            return 'ytd'
+        elif sessions <= 250:
+            return '1y'
+        return '5y'
 
 
 class DividendsIEX(BaseIEX):
+    cache_timeout = 60 * 60 * 24
+    weight = 2
+
     def get_url(self, ticker, num=5):
-        return f'https://cloud.iexapis.com/stable/stock/{ticker}/dividends/{num}y?token={IEX_API_KEY}'
+        return f'{IEX_BASE_URL}/stock/{ticker}/dividends/{num}y?token={IEX_API_KEY}'
 
 
 class FinancialIEX(BaseIEX):
+    cache_timeout = 60 * 60 * 24
+    weight = 5
+
     def get_url(self, ticker):
-        return f'https://cloud.iexapis.com/stable/stock/{ticker}/financials/4?token={IEX_API_KEY}'
+        return f'{IEX_BASE_URL}/stock/{ticker}/financials/4?token={IEX_API_KEY}'
 
     def get_data(self):
         data = super().get_data()
         return data.get('financials', '')
 
 
+def crawl_all(crawlers, deadline):
+    """
+    Function runs all :crawlers: at the same time and waits for them at most
+    :deadline: seconds. Crawlers which are not finished by then (or failed)
+    are dropped. Socket timeout of every crawler is also limited to
+    :deadline:, so its thread does not hang after the deadline.
+    :param crawlers: format {'name': crawler}
+    :param deadline: seconds: float
+    :return: format ({'name': articles}, [dropped names])
+    """
+    if not crawlers:
+        return {}, []
+    executor = ThreadPoolExecutor(max_workers=len(crawlers))
+    futures = {}
+    for name, crawler in crawlers.items():
+        crawler.timeout = min(crawler.timeout, deadline)
+        futures[executor.submit(crawler.get_data)] = name
+    done, _ = wait(futures, timeout=deadline)
+    executor.shutdown(wait=False)
+
+    results, dropped = {}, []
+    for future, name in futures.items():
+        if future in done and future.exception() is None:
+            results[name] = future.result()
+        else:
+            dropped.append(name)
+    return results, dropped
+
+
 class BaseCrawler(ABC): # pragma: no cover
+    timeout = HTTP_TIMEOUT
+    # part of the page which has news, only this part is parsed
+    parse_only = None
 
     def get_soup(self):
         url = self.url.format(self.formats)
-        response = requests.get(url)
+        response = get_session().get(url, timeout=self.timeout)
         if response.status_code != 200:
             return None
-        c = response.content
-        soup = BeautifulSoup(c, 'lxml')
-        return soup
+        return self.parse(response.content)
+
+    def parse(self, content):
+        return BeautifulSoup(content, 'lxml', parse_only=self.parse_only)
 
     @abstractmethod
     def get_news(self, soup):
@@ -102,6 +394,7 @@ class GoogleCrawler(BaseCrawler):   # pragma: no cover
         self.formats = self.ticker
 
     url = 'https://www.google.com/search?q=NASDAQ:{}&tbm=nws'
+    parse_only = SoupStrainer('div', 'g')
 
     def get_news(self, soup):
         return soup.find_all('div', 'g')
@@ -119,9 +412,11 @@ class YahooCrawler(BaseCrawler):    # pragma: no cover
         self.formats = ticker
 
     url = 'https://finance.yahoo.com/quote/{}'
+    parse_only = SoupStrainer('ul', 'My(0) Ov(h) P(0) Wow(bw)')
 
     def get_news(self, soup):
-        return soup.find('ul', 'My(0) Ov(h) P(0) Wow(bw)')
+        news = soup.find('ul', 'My(0) Ov(h) P(0) Wow(bw)')
+        return news.find_all('li', recursive=False)
 
     def article_text(self, article):
         title = article.h3.text
@@ -0,0 +1,30 @@
+from django.core.management.base import BaseCommand
+
+from my_wallet.stocks.utils import add_many_stocks
+
+
+class Command(BaseCommand):
+    help = 'Add new stocks with all their data from IEX'
+
+    def add_arguments(self, parser):
+        parser.add_argument('tickers', nargs='*', help='tickers to add')
+        parser.add_argument(
+            '-f', '--file', help='file with one ticker in every line')
+        parser.add_argument(
+            '-w', '--workers', type=int, default=None,
+            help='max number of concurrent requests')
+
+    def handle(self, *args, **options):
+        tickers = list(options['tickers'])
+        if options['file']:
+            with open(options['file']) as f:
+                tickers += [line.strip() for line in f if line.strip()]
+        results = add_many_stocks(tickers, max_workers=options['workers'])
+        self.stdout.write(self.style.SUCCESS(f'Added: {len(results["added"])}'))
+        if results['failed']:
+            self.stdout.write(self.style.ERROR(f'Failed: {", ".join(results["failed"])}'))
+        if results['rate_limited']:
+            self.stdout.write(self.style.WARNING(
+                f'Rate limited, run again in {results["retry_after"]:.0f}s: '
+                f'{", ".join(results["rate_limited"])}'
+            ))
@@ -0,0 +1,110 @@
+import time
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from my_wallet.portfolio.tasks import price_update_chunk
+from my_wallet.stocks.crawler import BaseIEX, chunked
+from my_wallet.stocks.models import Prices, Stocks
+from my_wallet.stocks.quotes import quote_store
+from my_wallet.stocks.utils import add_many_stocks, sync_all_past_data
+
+PREFIX = 'ZZB'
+
+
+@contextmanager
+def no_response_cache():
+    # every run downloads all data from stand-in, cached responses would
+    # make throughput higher and stand-in data would stay in iex cache
+    crawlers, classes = [], [BaseIEX]
+    while classes:
+        crawler = classes.pop()
+        classes.extend(crawler.__subclasses__())
+        if 'cache_timeout' in vars(crawler):
+            crawlers.append((crawler, crawler.cache_timeout))
+    for crawler, _ in crawlers:
+        crawler.cache_timeout = None
+    try:
+        yield
+    finally:
+        for crawler, timeout in crawlers:
+            crawler.cache_timeout = timeout
+
+
+class Command(BaseCommand):
+    help = (
+        'Measure ingestion throughput (price_update, history sync and bulk '
+        'onboarding) against local IEX stand-in. Run with '
+        'IEX_BASE_URL=http://127.0.0.1:8001 and IEX_RATE_LIMIT=0. '
+        'Use an empty database, synthetic stocks and their quotes are deleted '
+        'afterwards. IEX responses are not cached during the benchmark.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--symbols', type=int, nargs='+', default=[100, 1000, 10000])
+        parser.add_argument(
+            '--gap', type=int, default=30,
+            help='days of missing history before sync')
+        parser.add_argument(
+            '--skip', nargs='*', default=[],
+            choices=['quotes', 'history', 'onboarding'])
+
+    def measure(self, name, num_symbols, func):
+        rows_before = Prices.objects.count()
+        start = time.perf_counter()
+        func()
+        elapsed = time.perf_counter() - start
+        rows = Prices.objects.count() - rows_before
+        self.stdout.write(
+            f'{name:<12} {num_symbols:>7} symbols {elapsed:>9.2f}s '
+            f'{num_symbols / elapsed:>10.1f} tickers/s {rows / elapsed:>12.1f} rows/s'
+        )
+
+    @staticmethod
+    def price_update():
+        # chunks are run one by one here, workers run them in parallel
+        tickers = Stocks.objects.values_list('ticker', flat=True)
+        for chunk in chunked(tickers, settings.QUOTES_CHUNK_SIZE):
+            price_update_chunk(chunk)
+
+    def make_stocks(self, num_symbols):
+        stocks = [
+            Stocks(name=f'{PREFIX}{i:05} Inc.', ticker=f'{PREFIX}{i:05}')
+            for i in range(num_symbols)
+        ]
+        Stocks.objects.bulk_create(stocks, batch_size=settings.BULK_BATCH_SIZE)
+        stocks = Stocks.objects.filter(ticker__startswith=PREFIX)
+        last_date = timezone.now().date() - timezone.timedelta(days=self.gap)
+        prices = [Prices(stock=stock, price=100, date_price=last_date) for stock in stocks]
+        Prices.objects.bulk_create(prices, batch_size=settings.BULK_BATCH_SIZE)
+
+    def cleanup(self, tickers):
+        Stocks.objects.filter(ticker__startswith=PREFIX).delete()
+        quote_store.delete(tickers)
+
+    def handle(self, *args, **options):
+        if 'iexapis.com' in settings.IEX_BASE_URL:
+            raise CommandError('Set IEX_BASE_URL to the local stand-in (manage.py iex_standin)')
+        if Stocks.objects.exists():
+            # tasks work on all stocks, so real data would be overwritten
+            raise CommandError('Run benchmark on an empty database')
+        self.gap = options['gap']
+        skip = options['skip']
+
+        for num_symbols in options['symbols']:
+            tickers = [f'{PREFIX}{i:05}' for i in range(num_symbols)]
+            try:
+                with no_response_cache():
+                    self.make_stocks(num_symbols)
+                    if 'quotes' not in skip:
+                        self.measure('price_update', num_symbols, self.price_update)
+                    if 'history' not in skip:
+                        self.measure('history', num_symbols, sync_all_past_data)
+                    self.cleanup(tickers)
+                    if 'onboarding' not in skip:
+                        self.measure('onboarding', num_symbols, lambda: add_many_stocks(tickers))
+            finally:
+                self.cleanup(tickers)
@@ -0,0 +1,59 @@
+import os
+import time
+import tracemalloc
+
+from django.core.management.base import BaseCommand
+
+from my_wallet.stocks.crawler import GoogleCrawler, YahooCrawler
+
+FIXTURES = os.path.join(os.path.dirname(__file__), '..', '..', 'tests', 'fixtures')
+
+
+class Command(BaseCommand):
+    help = (
+        'Compare time and memory of parsing whole news pages and only their '
+        'news part. Default pages in tests/fixtures are synthetic: real result '
+        'markup with filler text and scripts, so numbers for them depend on '
+        'the filler. Pass pages saved from a browser with --google and --yahoo '
+        'to measure real ones.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--google', default=os.path.join(FIXTURES, 'google_news.html'),
+            help='saved Google News results page, default synthetic fixture')
+        parser.add_argument(
+            '--yahoo', default=os.path.join(FIXTURES, 'yahoo_quote.html'),
+            help='saved Yahoo Finance quote page, default synthetic fixture')
+        parser.add_argument('--repeat', type=int, default=50)
+
+    def measure(self, crawler, content, repeat):
+        start = time.perf_counter()
+        for _ in range(repeat):
+            crawler.get_articles(crawler.get_news(crawler.parse(content)))
+        elapsed = (time.perf_counter() - start) / repeat
+
+        tracemalloc.start()
+        crawler.get_articles(crawler.get_news(crawler.parse(content)))
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        return elapsed, peak
+
+    def handle(self, *args, **options):
+        pages = [
+            ('google', GoogleCrawler('AAPL'), options['google']),
+            ('yahoo', YahooCrawler('AAPL'), options['yahoo']),
+        ]
+        for name, crawler, path in pages:
+            with open(path, 'rb') as f:
+                content = f.read()
+            parse_only = crawler.parse_only
+            crawler.parse_only = None
+            full_time, full_memory = self.measure(crawler, content, options['repeat'])
+            crawler.parse_only = parse_only
+            part_time, part_memory = self.measure(crawler, content, options['repeat'])
+            self.stdout.write(
+                f'{name:<7} {len(content) / 1024:>7.1f} KB | '
+                f'whole page: {full_time * 1000:>7.2f} ms {full_memory / 1024:>8.1f} KB | '
+                f'news only: {part_time * 1000:>7.2f} ms {part_memory / 1024:>8.1f} KB'
+            )
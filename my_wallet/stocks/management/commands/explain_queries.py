@@ -0,0 +1,77 @@
+import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from my_wallet.portfolio.models import Portfolio, Transaction
+from my_wallet.stocks.models import Dividends, Prices, Stocks
+
+# parts of SQLite and PostgreSQL plans which mean that the whole table
+# (or index) is read and that rows are sorted after reading
+SCAN_MARKS = [' SCAN ', 'Seq Scan']
+SORT_MARKS = ['USE TEMP B-TREE', 'Sort Key']
+
+
+def describe_plan(plan):
+    access = 'SCAN' if any(mark in plan for mark in SCAN_MARKS) else 'index'
+    if any(mark in plan for mark in SORT_MARKS):
+        access += ' + sort'
+    return access
+
+
+class Command(BaseCommand):
+    help = (
+        'Show query plans of the most frequent time-series and ticker lookups '
+        'and whether they use indexes. Plans are shown only for the current '
+        'schema. To compare them with plans without the indexes, migrate back '
+        'with `migrate stocks 0014` and `migrate portfolio 0005`, run this '
+        'command again and then run `migrate` to restore the indexes. Prices '
+        'have no separate stock_id index, lookups by stock use the '
+        '(stock, date_price) unique index. On PostgreSQL run ANALYZE first, '
+        'with small tables the planner prefers sequential scans anyway. '
+        'SQLite runs iexact as LIKE, so only PostgreSQL uses UPPER(ticker) '
+        'index for it.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--ticker', help='stock used in queries, default the first one')
+        parser.add_argument(
+            '--analyze', action='store_true',
+            help='run queries and show real times (PostgreSQL only)')
+
+    def get_queries(self, stock, portfolio):
+        year_ago = datetime.date.today() - datetime.timedelta(days=365)
+        queries = {
+            'stock by ticker': Stocks.objects.filter(ticker=stock.ticker),
+            'stock by ticker (iexact)': Stocks.objects.filter(ticker__iexact=stock.ticker.lower()),
+            'prices by ticker': Prices.objects.filter(stock__ticker=stock.ticker),
+            'prices of last year': Prices.objects.filter(stock=stock, date_price__gte=year_ago),
+            'last price': Prices.objects.filter(stock=stock).order_by('-date_price')[:1],
+            'dividends of stock': Dividends.objects.filter(stock=stock),
+            'dividends of last year': Dividends.objects.filter(stock=stock, payment__gte=year_ago),
+        }
+        if portfolio is not None:
+            queries['transactions of portfolio'] = Transaction.objects.filter(portfolio=portfolio)
+        return queries
+
+    def handle(self, *args, **options):
+        stocks = Stocks.objects.all()
+        if options['ticker']:
+            stocks = stocks.filter(ticker=options['ticker'])
+        stock = stocks.first()
+        if stock is None:
+            raise CommandError('No stocks in database')
+        portfolio = Portfolio.objects.first()
+
+        explain_options = {}
+        if options['analyze']:
+            if connection.vendor != 'postgresql':
+                raise CommandError('--analyze works only with PostgreSQL')
+            explain_options['analyze'] = True
+
+        for name, queryset in self.get_queries(stock, portfolio).items():
+            plan = queryset.explain(**explain_options)
+            self.stdout.write(f'{name:<28} {describe_plan(plan)}')
+            if options['verbosity'] > 1:
+                for line in plan.splitlines():
+                    self.stdout.write(f'    {line}')
@@ -0,0 +1,33 @@
+from django.core.management.base import BaseCommand
+
+from my_wallet.stocks.standin import make_server
+
+
+class Command(BaseCommand):
+    help = 'Run local stand-in for IEX Cloud API (set IEX_BASE_URL to its address)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--host', default='127.0.0.1')
+        parser.add_argument('--port', type=int, default=8001)
+        parser.add_argument(
+            '--latency', type=float, default=0,
+            help='delay of every response in milliseconds')
+        parser.add_argument(
+            '--error-rate', type=float, default=0,
+            help='part of requests (0-1) which get 429/500/503')
+        parser.add_argument(
+            '--fixtures', default=None,
+            help='directory with recorded responses, e.g. stock/AAPL/chart/5y.json')
+
+    def handle(self, *args, **options):
+        server = make_server(
+            host=options['host'], port=options['port'],
+            latency=options['latency'] / 1000,
+            error_rate=options['error_rate'],
+            fixtures=options['fixtures'],
+        )
+        self.stdout.write(f'IEX stand-in is running on http://{options["host"]}:{options["port"]}')
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            server.server_close()
@@ -0,0 +1,39 @@
+import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+
+from my_wallet.stocks.partitions import PartitioningError, convert, create_partitions
+
+
+class Command(BaseCommand):
+    help = (
+        'Partition prices table by year (PostgreSQL 11+). With --convert '
+        'the existing table is replaced by a partitioned one, otherwise '
+        'partitions of the next years are created ahead of time, so run it '
+        'e.g. once a month. Prices model works the same with both tables.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--convert', action='store_true',
+            help='replace prices table with partitioned one')
+        parser.add_argument(
+            '--ahead', type=int, default=1,
+            help='number of future years with partitions, default 1')
+
+    def handle(self, *args, **options):
+        if options['ahead'] < 0:
+            raise CommandError('--ahead can not be negative')
+        this_year = datetime.date.today().year
+        last_year = this_year + options['ahead']
+        try:
+            if options['convert']:
+                created = convert(last_year)
+            else:
+                created = create_partitions(this_year, last_year)
+        except PartitioningError as e:
+            raise CommandError(e)
+        for name in created:
+            self.stdout.write(f'Created {name}')
+        if not created:
+            self.stdout.write('All partitions exist')
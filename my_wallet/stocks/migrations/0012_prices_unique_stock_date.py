@@ -0,0 +1,30 @@
+from django.db import migrations
+from django.db.models import Max
+
+
+def remove_duplicated_prices(apps, schema_editor):
+    # keep only the newest row for every (stock, date_price), one DELETE
+    # with subquery instead of one for every duplicated pair
+    Prices = apps.get_model('stocks', 'Prices')
+    newest = (
+        Prices.objects.order_by()
+        .values('stock', 'date_price')
+        .annotate(last_id=Max('id'))
+        .values('last_id')
+    )
+    Prices.objects.exclude(id__in=newest).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('stocks', '0011_auto_20190715_0004'),
+    ]
+
+    operations = [
+        migrations.RunPython(remove_duplicated_prices, migrations.RunPython.noop),
+        migrations.AlterUniqueTogether(
+            name='prices',
+            unique_together={('stock', 'date_price')},
+        ),
+    ]
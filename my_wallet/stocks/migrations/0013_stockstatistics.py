@@ -0,0 +1,38 @@
+# Generated by Django 2.2.28 on 2026-10-18 09:01
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('stocks', '0012_prices_unique_stock_date'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StockStatistics',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('price', models.DecimalField(decimal_places=2, max_digits=11)),
+                ('change_1d', models.FloatField(blank=True, null=True)),
+                ('change_1w', models.FloatField(blank=True, null=True)),
+                ('change_1m', models.FloatField(blank=True, null=True)),
+                ('change_ytd', models.FloatField(blank=True, null=True)),
+                ('change_1y', models.FloatField(blank=True, null=True)),
+                ('year_change', models.DecimalField(blank=True, decimal_places=2, max_digits=11, null=True)),
+                ('high_52w', models.DecimalField(blank=True, decimal_places=2, max_digits=11, null=True)),
+                ('low_52w', models.DecimalField(blank=True, decimal_places=2, max_digits=11, null=True)),
+                ('avg_volume', models.FloatField(blank=True, null=True)),
+                ('dividends_sum', models.DecimalField(decimal_places=2, default=0, max_digits=13)),
+                ('updated', models.DateTimeField(auto_now=True)),
+                ('stock', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='statistics', to='stocks.Stocks')),
+            ],
+            options={
+                'verbose_name': 'stock statistics',
+                'verbose_name_plural': 'stock statistics',
+            },
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 2.2.28 on 2026-10-18 09:08
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('stocks', '0013_stockstatistics'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='stockstatistics',
+            name='dividend_yield',
+            field=models.FloatField(blank=True, db_index=True, null=True),
+        ),
+    ]
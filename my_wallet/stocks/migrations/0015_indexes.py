@@ -0,0 +1,49 @@
+# Generated by Django 2.2.28 on 2026-10-18 09:09
+
+from django.db import migrations, models
+from django.db.models import Count
+from django.db.models.functions import Upper
+
+
+def check_duplicated_tickers(apps, schema_editor):
+    # stocks have prices, dividends and transactions, so duplicates are
+    # not merged automatically - they have to be fixed before migration
+    Stocks = apps.get_model('stocks', 'Stocks')
+    duplicates = (
+        Stocks.objects.order_by()
+        .values(upper_ticker=Upper('ticker'))
+        .annotate(count=Count('id'))
+        .filter(count__gt=1)
+        .values_list('upper_ticker', flat=True)
+    )
+    if duplicates:
+        raise ValueError(
+            'Tickers have to be unique (case-insensitive), merge or remove '
+            f'duplicated stocks before migration: {", ".join(sorted(duplicates))}'
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('stocks', '0014_stockstatistics_dividend_yield'),
+    ]
+
+    operations = [
+        migrations.RunPython(check_duplicated_tickers, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='stocks',
+            name='ticker',
+            field=models.CharField(max_length=10, unique=True),
+        ),
+        # Django 2.2 has no functional indexes. UPPER() is the same on
+        # PostgreSQL and SQLite, iexact lookup on PostgreSQL uses this index
+        migrations.RunSQL(
+            'CREATE UNIQUE INDEX stocks_stocks_ticker_upper_uniq ON stocks_stocks (UPPER(ticker))',
+            'DROP INDEX stocks_stocks_ticker_upper_uniq',
+        ),
+        migrations.AddIndex(
+            model_name='dividends',
+            index=models.Index(fields=['stock', 'payment'], name='dividends_stock_payment_idx'),
+        ),
+    ]
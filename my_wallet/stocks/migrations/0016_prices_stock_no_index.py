@@ -0,0 +1,19 @@
+# Generated by Django 2.2.28 on 2026-10-18 09:36
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('stocks', '0015_indexes'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='prices',
+            name='stock',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='past', to='stocks.Stocks'),
+        ),
+    ]
@@ -2,80 +2,103 @@ import datetime
 import math
 from decimal import ROUND_HALF_UP, Decimal
 
+from django.conf import settings
 from django.core.cache import cache
-from django.db import models
-from django.db.models import Count, Max, Min, Q, Sum
+from django.db import models, transaction
+from django.db.models import (
+    Avg, Count, ExpressionWrapper, F, FloatField, Max, Min, OuterRef,
+    Subquery, Sum, Value,
+)
+from django.db.models.functions import (
+    Cast, Concat, ExtractQuarter, ExtractYear, NullIf,
+)
 from django.utils import timezone
+from django.utils.functional import cached_property
 
 from .crawler import QuotesIEX
+from .quotes import quote_store
+from .trading_calendar import calendar
 
 
-def find_quote_day(date, days_ago=0, type='earlier'):
-    """
-    Function is responsible for finding the nearest quote day in the past.
-    First function get the starting date (:date: - :days_ago:). Next function
-    found the nearest working day :earlier: or :later:
-    E.G. (if type = 'earlier')
-        starting date = Sunday -> return = Friday
-        starting date = Friday -> return = Saturday
-    :param date: the beginning date: datetime
-    :param days_ago: how many days from the beginning date: int
-    :param type: can be 'earlier' or 'later': str
-    :return: datetime
-    """
-    quote_day = date - timezone.timedelta(days=days_ago)
-
-    if type == 'earlier':
-        if quote_day.weekday() == 6:
-            quote_day -= timezone.timedelta(days=2)
-            return quote_day
-        elif quote_day.weekday() == 0:
-            quote_day -= timezone.timedelta(days=3)
-            return quote_day
-        quote_day -= timezone.timedelta(days=1)
-        return quote_day
-    elif type == 'later':
-        if quote_day.weekday() == 5:
-            quote_day += timezone.timedelta(days=2)
-            return quote_day
-        elif quote_day.weekday() == 4:
-            quote_day += timezone.timedelta(days=3)
-            return quote_day
-        quote_day += timezone.timedelta(days=1)
-        return quote_day
-    else:   # pragma: no cover
-        raise ValueError('Not correct type')
+# calendar days of return horizons. '1d' is the previous price and 'ytd'
+# starts on the last day of the previous year
+HORIZONS = {
+    '1w': 7, '1m': 30, '3m': 91, '6m': 182,
+    '1y': 365, '3y': 3 * 365, '5y': 5 * 365,
+}
+
+
+def get_horizon_start(horizon, date):
+    # the last session on or before the start of horizon. Starts before
+    # trading calendar are not snapped
+    if horizon == 'ytd':
+        start = datetime.date(date.year - 1, 12, 31)
+    elif horizon in HORIZONS:
+        start = date - datetime.timedelta(days=HORIZONS[horizon])
+    else:
+        raise ValueError(f'Unknown horizon: {horizon}')
+    return calendar.previous_session(start, include=True) or start
+
+
+def get_return(price, start_price):
+    # percent return calculated by database, 100.0 avoids integer division
+    change = Value(100.0) * F(price) / NullIf(F(start_price), Value(0)) - Value(100.0)
+    return Cast(ExpressionWrapper(change, output_field=FloatField()), FloatField())
 
 
 class StockManager(models.Manager):
-    def highest_dividends(self):
+    def with_returns(self, horizons, date=None):
         """
-        classmethod responsible for collect data about dividends rate.
-        Dividends model is used. Reversed sorted dict is returned
-        :return: format {'ticker': ..., 'sum_dividends': data in percent}
+        Method annotates stocks with the last price on or before :date: and
+        start price and percent return of every horizon. Start price is the
+        last price on or before the start of horizon, so missing days are
+        skipped. Everything is calculated with one query.
+        :param horizons: e.g. ['1d', '1m', 'ytd', '1y']: list
+        :param date: end of returns, default today: date
+        :return: queryset with end_date, end_price, start_<horizon> and return_<horizon>
         """
-        year_ago = datetime.date.today() - datetime.timedelta(days=365)
-        last_year = Sum('dividends__amount', filter=Q(dividends__payment__gte=year_ago))
-        data = self.values('ticker').annotate(sum_dividends=last_year)
-        for line in data:
-            dividend = line['sum_dividends']
-            dividend = dividend if dividend else 0
-            price = cache.get(line['ticker'] + '_price')
-            if price:
-                price = Decimal(price)
-            percents = Decimal('0.0001')
-            dividend = dividend/price if price else None
-            if dividend:
-                line['sum_dividends'] = Decimal(dividend * 100).quantize(percents, ROUND_HALF_UP)
+        date = date or timezone.now().date()
+        prices = (
+            Prices.objects.filter(stock=OuterRef('pk'), date_price__lte=date)
+            .order_by('-date_price')
+        )
+        annotations = {
+            'end_date': Subquery(prices.values('date_price')[:1]),
+            'end_price': Subquery(prices.values('price')[:1]),
+        }
+        for horizon in horizons:
+            if horizon == '1d':
+                start = prices.values('price')[1:2]
             else:
-                line['sum_dividends'] = 0
-        data = sorted(data, key=lambda line: line['sum_dividends'], reverse=True)
-        return data
+                start = prices.filter(
+                    date_price__lte=get_horizon_start(horizon, date)).values('price')[:1]
+            annotations['start_' + horizon] = Subquery(start)
+        queryset = self.annotate(**annotations)
+        returns = {
+            'return_' + horizon: get_return('end_price', 'start_' + horizon)
+            for horizon in horizons
+        }
+        return queryset.annotate(**returns)
+
+    def highest_dividends(self, limit=5):
+        """
+        Method returns stocks with the highest dividend yield (dividends
+        of the last 12 months / last price). Yields are saved in
+        StockStatistics, so it reads :limit: rows of indexed column.
+        :return: format [{'ticker': ..., 'dividend_yield': data in percent}, ...]
+        """
+        statistics = (
+            StockStatistics.objects.filter(dividend_yield__gt=0)
+            .order_by('-dividend_yield')
+            .values('dividend_yield', ticker=F('stock__ticker'))
+        )
+        return list(statistics[:limit])
 
 
 class Stocks(models.Model):
     name = models.CharField(max_length=50)
-    ticker = models.CharField(max_length=10)
+    # migration 0015 adds also unique index on UPPER(ticker) for iexact lookups
+    ticker = models.CharField(max_length=10, unique=True)
 
     objects = StockManager()
 
@@ -88,33 +111,44 @@ class Stocks(models.Model):
     def __str__(self):
         return self.name
 
+    @cached_property
+    def quote(self):
+        # views showing many stocks set it from quote_store.get_many
+        return quote_store.get(self.ticker)
+
     @property
     def current_price(self):
-        return cache.get(self.ticker + '_price')
+        return self.quote.get('price')
 
     @property
     def day_change(self):
-        return cache.get(self.ticker + '_day_change')
+        return self.quote.get('day_change')
 
     @property
     def percent_change(self):
-        return cache.get(self.ticker + '_percent_change')
+        return self.quote.get('percent_change')
 
     @property
     def day_low(self):
-        return cache.get(self.ticker + '_day_low')
+        return self.quote.get('day_low')
 
     @property
     def day_high(self):
-        return cache.get(self.ticker + '_day_high')
+        return self.quote.get('day_high')
+
+    def get_statistic(self, name, default='No data'):
+        # list view selects statistics together with stocks
+        statistics = getattr(self, 'statistics', None)
+        value = getattr(statistics, name, None)
+        return default if value is None else value
 
     @property
     def year_change(self):
-        return self.get_change(num_days=365)['currency']
+        return self.get_statistic('year_change')
 
     @property
     def perc_year_change(self):
-        return self.get_change(num_days=365)['percent']
+        return self.get_statistic('change_1y', 'no data')
 
     def dividend_amount(self):
         year_ago = datetime.date.today() - datetime.timedelta(days=365)
@@ -123,7 +157,7 @@ class Stocks(models.Model):
         return data['amount'] or 0
 
     def dividend_rate(self):
-        price = cache.get(self.ticker + '_price')
+        price = self.current_price
         if not price:
             return 'Brak'
         price = Decimal(price)
@@ -136,38 +170,21 @@ class Stocks(models.Model):
     def find_past_price(self, num_days):
         today = timezone.now().date()
         past_date = today - datetime.timedelta(days=num_days)
-
-        while True:
-            try:
-                past_price = self.past.get(date_price=past_date).price
-            except Prices.DoesNotExist:
-                past_date -= datetime.timedelta(days=1)
-            else:
-                break
-        return past_price
+        past_price = Prices.objects.as_of(self, past_date)
+        return past_price.price if past_price else None
 
     def dividends_summarize(self):
-        past_dividends = []
-        if not self.dividends.exists():
-            return []  # None will cause error in pagination
-        for dividend in self.dividends.all():
-            one_quarter = {
-                'payment': dividend.payment,
-                'record': dividend.record,
-                'amount': dividend.amount,
-                'quarter': dividend.which_quarter()
-             }
-            past_dividends.append(one_quarter)
-        return past_dividends
+        # queryset, so pagination reads only one page from database
+        return self.dividends.with_rates()
 
     def get_change(self, num_days):
         today = timezone.now().date()
         past_date = today - datetime.timedelta(days=num_days)
-        try:
-            data = self.past.filter(date_price__gte=past_date)
-            current_price = list(data)[-1].price
-            past_price = list(data)[0].price
-        except (AttributeError, IndexError):
+        past_date = calendar.next_session(past_date, include=True) or past_date
+        data = self.past.filter(date_price__gte=past_date).order_by('date_price')
+        past_price = data.values_list('price', flat=True).first()
+        current_price = data.values_list('price', flat=True).last()
+        if not past_price or current_price is None:
             return {'currency': 'No data', 'percent': 'no data'}
         currency = current_price - past_price
         percent = ((current_price/past_price)-1) * 100
@@ -188,6 +205,25 @@ class StockDetail(models.Model):
         ordering = ('sector', )
 
 
+class DividendManager(models.Manager):
+    def with_rates(self):
+        """
+        Method annotates dividends with close price on record date
+        (record_price) and quarter label e.g. '1Q 2019', both calculated
+        by database. get_rate and which_quarter use them without queries.
+        """
+        record_price = (
+            Prices.objects.filter(stock=OuterRef('stock'), date_price=OuterRef('record'))
+            .values('price')[:1]
+        )
+        quarter = Concat(
+            Cast(ExtractQuarter('record'), models.CharField()), Value('Q '),
+            Cast(ExtractYear('record'), models.CharField()),
+            output_field=models.CharField(),
+        )
+        return self.annotate(record_price=Subquery(record_price), quarter=quarter)
+
+
 class Dividends(models.Model):
     stock = models.ForeignKey(
         Stocks, on_delete=models.CASCADE, related_name='dividends')
@@ -196,16 +232,25 @@ class Dividends(models.Model):
     amount = models.DecimalField(
         max_digits=11, decimal_places=2, null=True, blank=True)
 
+    objects = DividendManager()
+
     @property
     def get_rate(self):
         percents = Decimal('0.0001')
-        price = Prices.objects.filter(stock=self.stock, date_price=self.record)
+        if hasattr(self, 'record_price'):
+            price = self.record_price
+        else:
+            price = (
+                Prices.objects.filter(stock=self.stock_id, date_price=self.record)
+                .values_list('price', flat=True).first()
+            )
         if price:
-            price = price[0].price
             return Decimal(self.amount/price * 100).quantize(percents, ROUND_HALF_UP)
         return 'No data'
 
     def which_quarter(self):
+        if hasattr(self, 'quarter'):
+            return self.quarter
         present_quarter = math.ceil(self.record.month / 3)
         return f'{present_quarter}Q {self.record.year}'
 
@@ -214,6 +259,9 @@ class Dividends(models.Model):
 
     class Meta:
         ordering = ('-payment', )
+        indexes = [
+            models.Index(fields=['stock', 'payment'], name='dividends_stock_payment_idx'),
+        ]
 
 
 class Financial(models.Model):
@@ -249,34 +297,83 @@ class Financial(models.Model):
         ordering = ('-total_revenue', )
 
 
+# movers are refreshed after daily prices are saved
+MOVERS_KEY = 'movers'
+MOVERS_COUNT = 10
+
+
 class PriceManager(models.Manager):
-    def year_change(self):
-        today = datetime.datetime.now().date()
-        present_date = find_quote_day(today, days_ago=50)
-        past_date = find_quote_day(today, days_ago=365)
-        data = (
-            self.values_list('stock__ticker', 'date_price', 'price')
-                .filter(date_price__in=[present_date, past_date])
-                .order_by('stock__ticker')
+    def as_of(self, stock, date):
+        """
+        Method finds the last price of :stock: on or before :date:. It is one
+        query which uses (stock, date_price) unique index.
+        :return: Prices or None if there is no earlier price
+        """
+        return (
+            self.filter(stock=stock, date_price__lte=date)
+            .order_by('-date_price').first()
         )
-        results = {}
-        for (ticker, _, price) in data:
-            if not ticker in results:
-                results[ticker] = [price, ]
-            else:
-                results[ticker].append(price)
-        final = []
-        for (key, values) in results.items():
-            if len(values) == 2:
-                perc_return = ((values[0] / values[1]) - 1) * 100
-                final.append([key, perc_return])
-        return sorted(final, key=lambda x: x[1])
+
+    def as_of_all(self, date, tickers=None):
+        """
+        Method finds the last price on or before :date: of every stock
+        (or stocks with :tickers:) with one query. Stocks without earlier
+        prices are skipped.
+        :return: queryset of Prices with stocks
+        """
+        last_price = (
+            self.filter(stock=OuterRef('pk'), date_price__lte=date)
+            .order_by('-date_price').values('pk')[:1]
+        )
+        stocks = Stocks.objects.all()
+        if tickers is not None:
+            stocks = stocks.filter(ticker__in=tickers)
+        ids = stocks.annotate(price_id=Subquery(last_price)).values('price_id')
+        return self.filter(pk__in=ids).select_related('stock').order_by('stock__ticker')
+
+    def year_change(self, date=None):
+        """
+        Method ranks stocks by one year return. Prices are found as of
+        :date: and a year before, so stocks without a price on exactly
+        these days are not skipped. Stocks without any of the prices are.
+        :param date: end of returns, default today: date
+        :return: [(ticker, percent return), ...] sorted from the lowest return
+        """
+        stocks = (
+            Stocks.objects.with_returns(['1y'], date)
+            .filter(return_1y__isnull=False)
+            .order_by('return_1y', 'ticker')
+            .values_list('ticker', 'return_1y')
+        )
+        return list(stocks)
+
+    def refresh_movers(self, date=None):
+        """
+        Method saves in cache MOVERS_COUNT stocks with the highest
+        and the lowest one year return.
+        :return: format {'rising': [...], 'falling': [...]}, the best or the worst first
+        """
+        ranking = self.year_change(date)
+        movers = {
+            'rising': ranking[::-1][:MOVERS_COUNT],
+            'falling': ranking[:MOVERS_COUNT],
+        }
+        cache.set(MOVERS_KEY, movers, None)
+        return movers
+
+    def get_movers(self):
+        movers = cache.get(MOVERS_KEY)
+        if movers is None:
+            movers = self.refresh_movers()
+        return movers
 
 
 class Prices(models.Model):
+    # (stock, date_price) unique index starts with stock, so the foreign
+    # key does not need its own index
     stock = models.ForeignKey(
         Stocks, on_delete=models.CASCADE,
-        related_name='past'
+        related_name='past', db_index=False
     )
     price = models.DecimalField(
         max_digits=11, decimal_places=2, null=True, blank=True)
@@ -292,3 +389,116 @@ class Prices(models.Model):
     class Meta:
         get_latest_by = 'date_price'
         ordering = ('-date_price',)
+        unique_together = ('stock', 'date_price')
+
+
+def get_dividend_yield(dividends_sum, price):
+    if not dividends_sum or not price:
+        return None
+    return float(dividends_sum / price * 100)
+
+
+class StatisticsManager(models.Manager):
+    horizons = ['1d', '1w', '1m', 'ytd', '1y']
+
+    def refresh(self, today=None):
+        """
+        Method calculates statistics of all stocks with one query
+        (subquery per value) and replaces saved statistics.
+        :param today: date of calculation, default today: date
+        :return: number of stocks with statistics: int
+        """
+        today = today or timezone.now().date()
+        year_ago = today - datetime.timedelta(days=365)
+        last_year = (
+            Prices.objects.filter(stock=OuterRef('pk'), date_price__gt=year_ago)
+            .order_by().values('stock')
+        )
+        dividends = (
+            Dividends.objects.filter(stock=OuterRef('pk'), payment__gt=year_ago)
+            .order_by().values('stock')
+        )
+        annotations = {
+            'high': Subquery(
+                last_year.annotate(high=Max('price')).values('high'),
+                output_field=models.DecimalField(max_digits=11, decimal_places=2)),
+            'low': Subquery(
+                last_year.annotate(low=Min('price')).values('low'),
+                output_field=models.DecimalField(max_digits=11, decimal_places=2)),
+            'volume': Subquery(
+                last_year.annotate(volume=Avg('volume')).values('volume'),
+                output_field=FloatField()),
+            'dividends_sum': Subquery(
+                dividends.annotate(total=Sum('amount')).values('total'),
+                output_field=models.DecimalField(max_digits=13, decimal_places=2)),
+        }
+        fields = ['end_date', 'end_price', 'start_1y'] + [
+            'return_' + horizon for horizon in self.horizons]
+
+        statistics = []
+        rows = (
+            Stocks.objects.with_returns(self.horizons, today)
+            .annotate(**annotations)
+            .values('pk', *fields, *annotations)
+        )
+        for row in rows:
+            price = row['end_price']
+            if price is None:
+                continue
+            statistics.append(self.model(
+                stock_id=row['pk'],
+                date=row['end_date'],
+                price=price,
+                change_1d=row['return_1d'],
+                change_1w=row['return_1w'],
+                change_1m=row['return_1m'],
+                change_ytd=row['return_ytd'],
+                change_1y=row['return_1y'],
+                year_change=price - row['start_1y'] if row['start_1y'] else None,
+                high_52w=row['high'],
+                low_52w=row['low'],
+                avg_volume=row['volume'],
+                dividends_sum=row['dividends_sum'] or 0,
+                dividend_yield=get_dividend_yield(row['dividends_sum'], price),
+            ))
+        with transaction.atomic():
+            self.all().delete()
+            self.bulk_create(statistics, batch_size=settings.BULK_BATCH_SIZE)
+        return len(statistics)
+
+
+class StockStatistics(models.Model):
+    """
+    Statistics calculated from saved prices and dividends. They are
+    refreshed after prices or dividends are saved. Changes and dividend
+    yield are in percents.
+    """
+    stock = models.OneToOneField(
+        Stocks, on_delete=models.CASCADE, related_name='statistics')
+    date = models.DateField()
+    price = models.DecimalField(max_digits=11, decimal_places=2)
+    change_1d = models.FloatField(null=True, blank=True)
+    change_1w = models.FloatField(null=True, blank=True)
+    change_1m = models.FloatField(null=True, blank=True)
+    change_ytd = models.FloatField(null=True, blank=True)
+    change_1y = models.FloatField(null=True, blank=True)
+    year_change = models.DecimalField(
+        max_digits=11, decimal_places=2, null=True, blank=True)
+    high_52w = models.DecimalField(
+        max_digits=11, decimal_places=2, null=True, blank=True)
+    low_52w = models.DecimalField(
+        max_digits=11, decimal_places=2, null=True, blank=True)
+    avg_volume = models.FloatField(null=True, blank=True)
+    dividends_sum = models.DecimalField(max_digits=13, decimal_places=2, default=0)
+    # index keeps the leaderboard of highest_dividends cheap
+    dividend_yield = models.FloatField(null=True, blank=True, db_index=True)
+    updated = models.DateTimeField(auto_now=True)
+
+    objects = StatisticsManager()
+
+    class Meta:
+        verbose_name = 'stock statistics'
+        verbose_name_plural = 'stock statistics'
+
+    def __str__(self):
+        return f'{self.stock} - {self.date}'
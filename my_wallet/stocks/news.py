@@ -0,0 +1,71 @@
+import logging
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils import timezone
+
+from .crawler import GoogleCrawler, YahooCrawler, crawl_all
+
+logger = logging.getLogger(__name__)
+
+# sources of news, every one is shown on its own tab
+NEWS_CRAWLERS = {
+    'google': GoogleCrawler,
+    'yahoo': YahooCrawler,
+}
+
+
+def get_news_key(ticker):
+    return 'news_' + ticker
+
+
+def fetch_news(ticker):
+    """
+    Function scrapes all sources at the same time within NEWS_DEADLINE
+    seconds. Sources which did not make it are empty and listed in 'dropped'.
+    """
+    crawlers = {name: crawler(ticker) for name, crawler in NEWS_CRAWLERS.items()}
+    results, dropped = crawl_all(crawlers, settings.NEWS_DEADLINE)
+    if dropped:
+        logger.warning(f'News for {ticker} dropped from: {", ".join(dropped)}')
+    news = {name: results.get(name, {}) for name in NEWS_CRAWLERS}
+    news['dropped'] = dropped
+    return news
+
+
+def refresh_news(ticker):
+    """
+    Function scrapes news for :ticker: and saves them in cache with
+    the time of update. Dropped sources keep news saved before.
+    :return: format {'google': ..., 'yahoo': ..., 'dropped': [...], 'updated': datetime}
+    """
+    news = fetch_news(ticker)
+    old_news = cache.get(get_news_key(ticker)) or {}
+    for name in news['dropped']:
+        if old_news.get(name):
+            news[name] = old_news[name]
+    news['updated'] = timezone.now()
+    cache.set(get_news_key(ticker), news, settings.NEWS_TIMEOUT)
+    cache.delete(get_news_key(ticker) + '_lock')
+    return news
+
+
+def get_news(ticker):
+    """
+    Function returns news from cache and never scrapes them itself.
+    If there are no news or they are older than NEWS_FRESH seconds,
+    refresh task is sent - only one until it is finished (or the lock
+    expires). Meanwhile old news (or empty ones) are returned.
+    :return: format {'google': ..., 'yahoo': ..., 'dropped': [...], 'updated': datetime or None}
+    """
+    from .tasks import refresh_stock_news
+
+    news = cache.get(get_news_key(ticker))
+    fresh_after = timezone.now() - timezone.timedelta(seconds=settings.NEWS_FRESH)
+    if news is None or news['updated'] < fresh_after:
+        if cache.add(get_news_key(ticker) + '_lock', 1, settings.NEWS_LOCK_TIMEOUT):
+            refresh_stock_news.delay(ticker)
+    if news is None:
+        news = {name: {} for name in NEWS_CRAWLERS}
+        news.update({'dropped': [], 'updated': None})
+    return news
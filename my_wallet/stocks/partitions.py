@@ -0,0 +1,135 @@
+"""
+Optional partitioning of Prices table by year of date_price (PostgreSQL 11+).
+Partitioned table keeps the same name and columns, so Prices model works
+without changes and queries with date_price ranges read only partitions of
+these years. Rows out of all ranges go to the default partition.
+"""
+from django.db import connection, transaction
+
+from .models import Prices
+
+TABLE = Prices._meta.db_table
+DEFAULT_PARTITION = f'{TABLE}_default'
+MIN_VERSION = 110000
+
+
+class PartitioningError(Exception):
+    pass
+
+
+def get_partition_name(year):
+    return f'{TABLE}_y{year}'
+
+
+def get_bounds(year):
+    return f'{year}-01-01', f'{year + 1}-01-01'
+
+
+def check_database():
+    if connection.vendor != 'postgresql':
+        raise PartitioningError('Partitioning needs PostgreSQL')
+    if connection.pg_version < MIN_VERSION:
+        raise PartitioningError('Partitioning needs PostgreSQL 11 or newer')
+
+
+def is_partitioned(cursor):
+    cursor.execute('SELECT relkind FROM pg_class WHERE relname = %s', [TABLE])
+    row = cursor.fetchone()
+    return row is not None and row[0] == 'p'
+
+
+def get_partitions(cursor):
+    cursor.execute(
+        'SELECT child.relname FROM pg_inherits '
+        'JOIN pg_class parent ON parent.oid = pg_inherits.inhparent '
+        'JOIN pg_class child ON child.oid = pg_inherits.inhrelid '
+        'WHERE parent.relname = %s', [TABLE])
+    return {row[0] for row in cursor.fetchall()}
+
+
+def create_partition(cursor, year):
+    """
+    Function adds partition of :year:. Rows of this year which are already
+    in the default partition are moved to the new one before it is attached.
+    :return: False if partition already exists
+    """
+    name = get_partition_name(year)
+    if name in get_partitions(cursor):
+        return False
+    start, end = get_bounds(year)
+    # partition needs all check constraints of table to be attached
+    cursor.execute(
+        f'CREATE TABLE {name} (LIKE {TABLE} INCLUDING DEFAULTS INCLUDING CONSTRAINTS)')
+    if DEFAULT_PARTITION in get_partitions(cursor):
+        cursor.execute(
+            f'WITH moved AS (DELETE FROM {DEFAULT_PARTITION} '
+            f'WHERE date_price >= %s AND date_price < %s RETURNING *) '
+            f'INSERT INTO {name} SELECT * FROM moved', [start, end])
+    cursor.execute(
+        f'ALTER TABLE {TABLE} ATTACH PARTITION {name} '
+        f'FOR VALUES FROM (%s) TO (%s)', [start, end])
+    return True
+
+
+def create_partitions(first_year, last_year):
+    """
+    Function adds missing partitions of years from :first_year: to
+    :last_year: (both included).
+    :return: list of created partitions
+    """
+    check_database()
+    created = []
+    with transaction.atomic(), connection.cursor() as cursor:
+        if not is_partitioned(cursor):
+            raise PartitioningError(f'{TABLE} is not partitioned yet')
+        for year in range(first_year, last_year + 1):
+            if create_partition(cursor, year):
+                created.append(get_partition_name(year))
+    return created
+
+
+def convert(last_year):
+    """
+    Function replaces Prices table with a partitioned one in one transaction.
+    Rows are copied and the id sequence, check, unique and foreign key
+    constraints keep their names (checks are copied with LIKE). Primary key
+    has to contain date_price, so it is (id, date_price); ids are still
+    unique because of the sequence.
+    :param last_year: partitions are created up to this year: int
+    :return: list of created partitions
+    """
+    check_database()
+    old = f'{TABLE}_old'
+    with transaction.atomic(), connection.cursor() as cursor:
+        if is_partitioned(cursor):
+            raise PartitioningError(f'{TABLE} is already partitioned')
+        constraints = connection.introspection.get_constraints(cursor, TABLE)
+        cursor.execute(f'SELECT EXTRACT(YEAR FROM MIN(date_price)) FROM {TABLE}')
+        first_year = int(cursor.fetchone()[0] or last_year)
+
+        cursor.execute(f'ALTER TABLE {TABLE} RENAME TO {old}')
+        cursor.execute(
+            f'CREATE TABLE {TABLE} (LIKE {old} INCLUDING DEFAULTS INCLUDING CONSTRAINTS) '
+            f'PARTITION BY RANGE (date_price)')
+        cursor.execute(f'CREATE TABLE {DEFAULT_PARTITION} PARTITION OF {TABLE} DEFAULT')
+        created = [
+            get_partition_name(year) for year in range(first_year, last_year + 1)
+            if create_partition(cursor, year)
+        ]
+        cursor.execute(f'INSERT INTO {TABLE} SELECT * FROM {old}')
+        cursor.execute(f'ALTER SEQUENCE {TABLE}_id_seq OWNED BY {TABLE}.id')
+        cursor.execute(f'DROP TABLE {old}')
+
+        cursor.execute(f'ALTER TABLE {TABLE} ADD CONSTRAINT {TABLE}_pkey PRIMARY KEY (id, date_price)')
+        for name, constraint in constraints.items():
+            columns = ', '.join(constraint['columns'])
+            if constraint['unique'] and not constraint['primary_key']:
+                cursor.execute(f'ALTER TABLE {TABLE} ADD CONSTRAINT {name} UNIQUE ({columns})')
+            elif constraint['foreign_key']:
+                table, column = constraint['foreign_key']
+                cursor.execute(
+                    f'ALTER TABLE {TABLE} ADD CONSTRAINT {name} FOREIGN KEY ({columns}) '
+                    f'REFERENCES {table} ({column}) DEFERRABLE INITIALLY DEFERRED')
+            elif constraint['index'] and not constraint['primary_key']:
+                cursor.execute(f'CREATE INDEX {name} ON {TABLE} ({columns})')
+    return created
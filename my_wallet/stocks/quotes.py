@@ -0,0 +1,98 @@
+import json
+import time
+
+from django.core.cache import cache
+from django_redis import get_redis_connection
+
+from config.settings import QUOTES_BATCH_SIZE, QUOTES_TIMEOUT
+
+from .crawler import chunked
+
+# fields of quote snapshot and names of the same values in IEX quote
+QUOTE_FIELDS = {
+    'price': 'latestPrice',
+    'day_change': 'change',
+    'percent_change': 'changePercent',
+    'day_low': 'low',
+    'day_high': 'high',
+}
+
+
+def make_quote(data):
+    """
+    Function makes quote snapshot from IEX quote. Missing values are 'no data'.
+    :param data: IEX quote: dict
+    :return: format {'price': ..., 'day_change': ..., 'percent_change': ..., ...}
+    """
+    quote = {field: data.get(name, 'no data') for field, name in QUOTE_FIELDS.items()}
+    if isinstance(quote['percent_change'], (int, float)):
+        quote['percent_change'] *= 100
+    return quote
+
+
+class QuoteStore:
+    """
+    Last quotes of all stocks kept in one Redis hash. Field is a ticker
+    and value is JSON quote snapshot, so quotes of any number of stocks
+    are read with one HMGET. Every snapshot has 'updated' timestamp and
+    snapshots older than :timeout: seconds are not returned, so a stock
+    which was not refreshed has no quote instead of the old one. Whole
+    hash expires after :timeout: seconds without any update.
+    """
+    def __init__(self, key='quotes', batch_size=QUOTES_BATCH_SIZE, timeout=QUOTES_TIMEOUT):
+        # key with the same prefix and version as keys of default cache
+        self.key = cache.make_key(key)
+        self.batch_size = batch_size
+        self.timeout = timeout
+        self._connection = None
+
+    @property
+    def connection(self):
+        if self._connection is None:
+            self._connection = get_redis_connection('default')
+        return self._connection
+
+    def set_many(self, quotes):
+        """
+        :param quotes: format {'AAPL': snapshot, ...}: dict
+        """
+        updated = time.time()
+        pipeline = self.connection.pipeline(transaction=False)
+        for batch in chunked(quotes.items(), self.batch_size):
+            for ticker, quote in batch:
+                pipeline.hset(self.key, ticker, json.dumps(dict(quote, updated=updated)))
+            pipeline.execute()
+        if self.timeout:
+            self.connection.expire(self.key, self.timeout)
+
+    def get_many(self, tickers):
+        """
+        :param tickers: list of tickers
+        :return: format {'AAPL': snapshot, ...}, empty dict for unknown
+        tickers and for snapshots older than timeout
+        """
+        tickers = list(tickers)
+        if not tickers:
+            return {}
+        values = self.connection.hmget(self.key, tickers)
+        oldest = time.time() - self.timeout if self.timeout else 0
+        quotes = {}
+        for ticker, value in zip(tickers, values):
+            quote = json.loads(value) if value else {}
+            quotes[ticker] = quote if quote.get('updated', 0) >= oldest else {}
+        return quotes
+
+    def get(self, ticker):
+        return self.get_many([ticker])[ticker]
+
+    def delete(self, tickers):
+        pipeline = self.connection.pipeline(transaction=False)
+        for batch in chunked(tickers, self.batch_size):
+            pipeline.hdel(self.key, *batch)
+            pipeline.execute()
+
+    def clear(self):
+        self.connection.delete(self.key)
+
+
+quote_store = QuoteStore()
@@ -0,0 +1,99 @@
+import time
+from email.utils import parsedate_to_datetime
+
+from django_redis import get_redis_connection
+
+from config.settings import IEX_RATE_BURST, IEX_RATE_LIMIT, IEX_RATE_MAX_WAIT
+
+# Token bucket kept in one Redis hash. Script refills tokens for the time
+# passed since the last call and takes :weight: tokens if there are enough.
+# It returns how many seconds caller has to wait (0 - tokens were taken).
+TOKEN_BUCKET_SCRIPT = """
+local rate = tonumber(ARGV[1])
+local burst = tonumber(ARGV[2])
+local weight = tonumber(ARGV[3])
+local now = tonumber(ARGV[4])
+local bucket = redis.call('HMGET', KEYS[1], 'tokens', 'time')
+local tokens = tonumber(bucket[1]) or burst
+local last = tonumber(bucket[2]) or now
+tokens = math.min(burst, tokens + math.max(0, now - last) * rate)
+local wait = 0
+if tokens >= weight then
+    tokens = tokens - weight
+else
+    wait = (weight - tokens) / rate
+end
+redis.call('HMSET', KEYS[1], 'tokens', tokens, 'time', now)
+redis.call('EXPIRE', KEYS[1], math.ceil(burst / rate) + 1)
+return tostring(wait)
+"""
+
+
+def parse_retry_after(value, default=1):
+    """
+    Function reads Retry-After header, which is a number of seconds or
+    HTTP date (RFC 7231).
+    :return: seconds to wait, :default: if header can not be parsed: float
+    """
+    if value is None:
+        return default
+    try:
+        return max(float(value), 0)
+    except ValueError:
+        pass
+    try:
+        date = parsedate_to_datetime(value)
+    except (TypeError, ValueError, IndexError):
+        return default
+    if date is None or date.tzinfo is None:
+        return default
+    return max(date.timestamp() - time.time(), 0)
+
+
+class RateLimitExceeded(Exception):
+    def __init__(self, retry_after):
+        self.retry_after = retry_after
+        super().__init__(f'IEX rate limit exceeded, retry after {retry_after:.2f}s')
+
+
+class TokenBucket:
+    """
+    Rate limiter shared by all processes which use the same Redis.
+    :rate: tokens added every second, :burst: max number of tokens.
+    Caller waits up to :max_wait: seconds for tokens, then
+    RateLimitExceeded is raised.
+    """
+    def __init__(self, key='iex_rate_limit', rate=IEX_RATE_LIMIT,
+                 burst=IEX_RATE_BURST, max_wait=IEX_RATE_MAX_WAIT):
+        self.key = key
+        self.rate = rate
+        self.burst = burst
+        self.max_wait = max_wait
+        self._script = None
+
+    @property
+    def script(self):
+        if self._script is None:
+            connection = get_redis_connection('default')
+            self._script = connection.register_script(TOKEN_BUCKET_SCRIPT)
+        return self._script
+
+    def try_acquire(self, weight=1):
+        weight = min(weight, self.burst)
+        args = [self.rate, self.burst, weight, time.time()]
+        return float(self.script(keys=[self.key], args=args))
+
+    def acquire(self, weight=1):
+        if not self.rate:
+            return
+        deadline = time.monotonic() + self.max_wait
+        while True:
+            wait = self.try_acquire(weight)
+            if not wait:
+                return
+            if time.monotonic() + wait > deadline:
+                raise RateLimitExceeded(wait)
+            time.sleep(wait)
+
+
+iex_limiter = TokenBucket()
@@ -0,0 +1,213 @@
+"""
+Local stand-in for IEX Cloud API. It serves synthetic data (or recorded
+responses) for every endpoint used by crawlers, so ingestion can be tested
+and benchmarked offline. Start it with `manage.py iex_standin` and set
+IEX_BASE_URL to its address.
+"""
+import datetime
+import json
+import os
+import random
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+# number of calendar days in IEX chart ranges
+RANGES = {'5d': 7, '1m': 31, '3m': 92, '6m': 183, '1y': 365, '2y': 730, '5y': 1826}
+
+
+def get_days(chart_range, today):
+    if chart_range == 'ytd':
+        return (today - datetime.date(today.year, 1, 1)).days
+    return RANGES.get(chart_range, 365)
+
+
+def make_quote(ticker):
+    rand = random.Random(ticker)
+    price = round(rand.uniform(10, 500), 2)
+    change = round(rand.uniform(-5, 5), 2)
+    return {
+        'symbol': ticker,
+        'companyName': f'{ticker} Inc.',
+        'latestPrice': price,
+        'change': change,
+        'changePercent': round(change / price, 4),
+        'low': round(price - abs(change), 2),
+        'high': round(price + abs(change), 2),
+    }
+
+
+def make_company(ticker):
+    return {
+        'symbol': ticker,
+        'companyName': f'{ticker} Inc.',
+        'sector': 'Technology',
+        'industry': 'Software',
+        'website': f'http://www.{ticker.lower()}.com',
+        'description': f'{ticker} is a synthetic company.',
+    }
+
+
+def make_chart(ticker, chart_range, today):
+    rand = random.Random(ticker + chart_range)
+    price = make_quote(ticker)['latestPrice']
+    bars = []
+    day = today - datetime.timedelta(days=get_days(chart_range, today))
+    while day < today:
+        day += datetime.timedelta(days=1)
+        if day.weekday() > 4:
+            continue
+        change = round(price * rand.uniform(-0.02, 0.02), 2)
+        bars.append({
+            'date': day.isoformat(),
+            'open': price,
+            'close': round(price + change, 2),
+            'volume': rand.randint(100_000, 10_000_000),
+            'change': change,
+            'changePercent': round(change / price * 100, 4),
+        })
+        price = max(round(price + change, 2), 1)
+    return bars
+
+
+def make_previous(ticker, today):
+    bars = make_chart(ticker, '5d', today)
+    previous = dict(bars[-1]) if bars else {}
+    previous['symbol'] = ticker
+    return previous
+
+
+def make_dividends(ticker, chart_range, today):
+    amount = round(random.Random(ticker).uniform(0.1, 2), 2)
+    dividends = []
+    for quarter in range(get_days(chart_range, today) // 91):
+        record = today - datetime.timedelta(days=91 * quarter + 30)
+        dividends.append({
+            'recordDate': record.isoformat(),
+            'paymentDate': (record + datetime.timedelta(days=14)).isoformat(),
+            'amount': amount,
+        })
+    return dividends
+
+
+def make_financials(ticker):
+    rand = random.Random(ticker)
+    financials = []
+    for _ in range(4):
+        revenue = rand.randint(10 ** 8, 10 ** 10)
+        financials.append({
+            'totalAssets': revenue * 3,
+            'totalLiabilities': revenue * 2,
+            'totalRevenue': revenue,
+            'grossProfit': revenue // 3,
+            'operatingIncome': revenue // 5,
+            'netIncome': revenue // 10,
+        })
+    return {'symbol': ticker, 'financials': financials}
+
+
+def make_type(ticker, data_type, today):
+    if data_type == 'quote':
+        return make_quote(ticker)
+    elif data_type == 'previous':
+        return make_previous(ticker, today)
+    elif data_type == 'company':
+        return make_company(ticker)
+    elif data_type == 'chart':
+        return make_chart(ticker, '1m', today)
+    raise KeyError(data_type)
+
+
+def get_payload(path, query, today=None):
+    """
+    Function returns synthetic IEX response for :path: (without base url).
+    :param path: e.g. '/stock/AAPL/chart/5y': str
+    :param query: parsed query string: dict
+    :return: data serializable to JSON. KeyError if path is unknown
+    """
+    today = today or datetime.date.today()
+    parts = [part for part in path.split('/') if part]
+    if len(parts) < 3 or parts[0] != 'stock':
+        raise KeyError(path)
+    ticker, endpoint, args = parts[1].upper(), parts[2], parts[3:]
+
+    if ticker == 'MARKET' and endpoint == 'batch':
+        symbols = query.get('symbols', [''])[0].split(',')
+        types = query.get('types', [''])[0].split(',')
+        return {
+            symbol.upper(): {data_type: make_type(symbol.upper(), data_type, today) for data_type in types}
+            for symbol in symbols if symbol
+        }
+    elif endpoint == 'book':
+        return {'quote': make_quote(ticker)}
+    elif endpoint == 'quote':
+        return make_quote(ticker)
+    elif endpoint == 'previous':
+        return make_previous(ticker, today)
+    elif endpoint == 'company':
+        return make_company(ticker)
+    elif endpoint == 'chart':
+        return make_chart(ticker, args[0] if args else '1m', today)
+    elif endpoint == 'dividends':
+        return make_dividends(ticker, args[0] if args else '1m', today)
+    elif endpoint == 'financials':
+        return make_financials(ticker)
+    raise KeyError(path)
+
+
+class IEXStandInHandler(BaseHTTPRequestHandler):
+    # set by make_server
+    latency = 0
+    error_rate = 0
+    fixtures = None
+
+    def get_recorded(self, path):
+        # recorded response e.g. FIXTURES/stock/AAPL/chart/5y.json
+        if not self.fixtures:
+            return None
+        file_path = os.path.join(self.fixtures, path.strip('/') + '.json')
+        if not os.path.isfile(file_path):
+            return None
+        with open(file_path, 'rb') as f:
+            return f.read()
+
+    def send(self, status, body):
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        if self.latency:
+            time.sleep(self.latency)
+        if self.error_rate and random.random() < self.error_rate:
+            self.send(random.choice([429, 500, 503]), b'"error"')
+            return
+        url = urlparse(self.path)
+        body = self.get_recorded(url.path)
+        if body is None:
+            try:
+                payload = get_payload(url.path, parse_qs(url.query))
+            except KeyError:
+                self.send(404, b'"Unknown symbol"')
+                return
+            body = json.dumps(payload).encode()
+        self.send(200, body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def make_server(host='127.0.0.1', port=8001, latency=0, error_rate=0, fixtures=None):
+    """
+    :param latency: delay of every response in seconds: float
+    :param error_rate: part of requests which get an error status: float
+    :param fixtures: directory with recorded responses: str
+    """
+    handler = type('Handler', (IEXStandInHandler, ), {
+        'latency': latency, 'error_rate': error_rate, 'fixtures': fixtures,
+    })
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    return server
@@ -1,35 +1,90 @@
-from datetime import datetime
 import logging
-from celery import shared_task
+from celery import group, shared_task
 
-import requests
-from .models import Prices, Stocks
+from django.conf import settings
+from django.utils.dateparse import parse_date
 
+from .crawler import BatchPreviousIEX, get_cache_stats
+from .models import Prices, StockStatistics, Stocks
+from .news import refresh_news
+from .ratelimit import RateLimitExceeded
+from .utils import add_many_stocks, sync_all_past_data
 
-@shared_task
-def update_stock_price():
+
+@shared_task(bind=True, max_retries=5)
+def update_stock_price(self):
+    """
+    Task saves the last end-of-day bar of every stock. Bars are downloaded
+    in batches and saved with one bulk insert. Bars which are already saved
+    (the same stock and date_price) are skipped, so the task can be rerun.
+    Statistics of all stocks and movers are recalculated afterwards.
+    """
     print('Running task update stocks')
-    tickets = Stocks.objects.values_list('ticker', flat=True)
-    for ticket in tickets:
-        url = f'https://api.iextrading.com/1.0/stock/{ticket}/previous'
-        response = requests.get(url)
-        if response.status_code == 404:
-            data = {'symbol': ticket}
-        else:
-            data = response.json()
-        if data.get('date'):
-            date_price = datetime.strptime(data.get('date'), '%Y-%m-%d')
-        else:
-            date_price = datetime.now().date()
-
-        Prices.objects.create(
-            stock=Stocks.objects.get(ticker__iexact=data.get('symbol')),
+    stocks = {
+        ticker.upper(): pk for ticker, pk in
+        Stocks.objects.values_list('ticker', 'pk')
+    }
+    try:
+        bars = BatchPreviousIEX(stocks).get_data()
+    except RateLimitExceeded as e:
+        raise self.retry(countdown=e.retry_after)
+    prices = []
+    for ticker, data in bars.items():
+        stock_id = stocks.get(ticker.upper())
+        if stock_id is None or not data or not data.get('date'):
+            logging.warning(f'No previous day data for {ticker}')
+            continue
+        prices.append(Prices(
+            stock_id=stock_id,
             price=float(data.get('close')) if data.get('close') else None,
-            date_price=date_price,
+            date_price=parse_date(data.get('date')),
             open=data.get('open') if data.get('open') else None,
             volume=data.get('volume') if data.get('volume') else None,
             change=data.get('change') if data.get('change') else None,
             percent_change=data.get('changePercent') if data.get('changePercent') else None,
-        )
-        print(f'Updated prices for {ticket}')
-        logging.info(f'Updated prices for {ticket} logging')
\ No newline at end of file
+        ))
+    Prices.objects.bulk_create(
+        prices, batch_size=settings.BULK_BATCH_SIZE, ignore_conflicts=True)
+    logging.info(f'Updated prices for {len(prices)} stocks')
+    count = StockStatistics.objects.refresh()
+    logging.info(f'Statistics refreshed for {count} stocks')
+    Prices.objects.refresh_movers()
+
+
+@shared_task(bind=True, max_retries=5)
+def add_stocks(self, tickers):
+    results = add_many_stocks(tickers)
+    logging.info(
+        f'Added {len(results["added"])} stocks, failed: {results["failed"]}, '
+        f'rate limited: {results["rate_limited"]}'
+    )
+    StockStatistics.objects.refresh()
+    if settings.IEX_CACHE_STATS:
+        logging.info(f'IEX cache: {get_cache_stats()}')
+    if results['rate_limited'] and self.request.retries < self.max_retries:
+        # only tickers stopped by rate limit are added again
+        raise self.retry(args=(results['rate_limited'], ), countdown=results['retry_after'])
+    return results
+
+
+@shared_task(bind=True, max_retries=5)
+def sync_prices_history(self):
+    # already saved prices are not downloaded again after retry
+    try:
+        total = sync_all_past_data()
+    except RateLimitExceeded as e:
+        raise self.retry(countdown=e.retry_after)
+    logging.info(f'Synced {total} prices')
+    StockStatistics.objects.refresh()
+    return total
+
+
+@shared_task
+def refresh_stock_news(ticker):
+    refresh_news(ticker)
+
+
+@shared_task
+def refresh_all_news():
+    tickers = Stocks.objects.values_list('ticker', flat=True)
+    group(refresh_stock_news.s(ticker) for ticker in tickers)()
@@ -0,0 +1,205 @@
+import json
+import os
+import threading
+from datetime import date
+
+from django.core.cache import caches
+from django.test import SimpleTestCase, override_settings
+from unittest import mock
+
+from config.settings import HTTP_POOL_SIZE
+from my_wallet.stocks.crawler import (
+    BatchQuotesIEX, CompanyIEX, GoogleCrawler, PastIEX, YahooCrawler,
+    get_cache_stats, get_response_key, get_session, crawl_all, iter_json_array,
+)
+
+FIXTURES = os.path.join(os.path.dirname(__file__), 'fixtures')
+
+
+class BatchQuotesIEXTest(SimpleTestCase):
+
+    def test_get_chunks(self):
+        tickers = [f'T{i}' for i in range(250)]
+        chunks = list(BatchQuotesIEX(tickers).get_chunks())
+        self.assertEqual([len(chunk) for chunk in chunks], [100, 100, 50])
+        self.assertEqual(chunks[2][-1], 'T249')
+
+    def test_get_url(self):
+        url = BatchQuotesIEX([]).get_url(['AAPL', 'AMZN'])
+        self.assertIn('market/batch?symbols=AAPL,AMZN&types=quote', url)
+
+    @mock.patch('my_wallet.stocks.crawler.BatchQuotesIEX.fetch')
+    def test_get_data(self, mock_fetch):
+        mock_fetch.side_effect = [
+            {'AAPL': {'quote': {'latestPrice': 100}}},
+            {'AMZN': {'quote': {'latestPrice': 1800}}},
+        ]
+        batch = BatchQuotesIEX(['AAPL', 'AMZN'])
+        batch.batch_size = 1
+        actual = batch.get_data()
+        expected = {
+            'AAPL': {'latestPrice': 100},
+            'AMZN': {'latestPrice': 1800},
+        }
+        self.assertDictEqual(actual, expected)
+        self.assertEqual(mock_fetch.call_count, 2)
+
+
+class SessionTest(SimpleTestCase):
+
+    def test_session_is_shared(self):
+        self.assertIs(get_session(), get_session())
+        session = get_session()
+        self.assertIn('gzip', session.headers['Accept-Encoding'])
+        adapter = session.get_adapter('https://cloud.iexapis.com')
+        self.assertEqual(adapter._pool_maxsize, HTTP_POOL_SIZE)
+
+    @mock.patch('my_wallet.stocks.crawler.os.getpid')
+    def test_new_session_after_fork(self, mock_getpid):
+        mock_getpid.return_value = -1
+        parent = get_session()
+        mock_getpid.return_value = -2
+        self.assertIsNot(get_session(), parent)
+
+
+class PastIEXTest(SimpleTestCase):
+
+    def test_get_range(self):
+        today = date(2019, 7, 15)
+        cases = [
+            (None, '5y'),
+            (date(2019, 7, 12), '5d'),
+            (date(2019, 6, 20), '1m'),
+            (date(2019, 5, 1), '3m'),
+            (date(2019, 1, 2), 'ytd'),
+            (date(2018, 9, 1), '1y'),
+            (date(2017, 1, 1), '5y'),
+        ]
+        for last_date, expected in cases:
+            self.assertEqual(PastIEX.get_range(last_date, today), expected)
+
+    def test_get_range_sessions(self):
+        # a week with weekend and Independence Day has only 4 sessions
+        self.assertEqual(PastIEX.get_range(date(2019, 6, 28), date(2019, 7, 7)), '5d')
+        self.assertEqual(PastIEX.get_range(date(2019, 6, 28), date(2019, 7, 9)), '1m')
+
+    def test_get_url(self):
+        self.assertIn('/stock/AAPL/chart/1m?', PastIEX('AAPL', '1m').url)
+        self.assertIn('/stock/AAPL/chart/5y?', PastIEX('AAPL').url)
+
+
+class ResponseCacheTest(SimpleTestCase):
+
+    def setUp(self):
+        # only keys written by tests, iex cache can be shared with other data
+        keys = [get_response_key(CompanyIEX('AAPL').url), 'hits', 'misses']
+        caches['iex'].delete_many(keys)
+        self.addCleanup(caches['iex'].delete_many, keys)
+
+    @override_settings(IEX_CACHE_STATS=True)
+    @mock.patch('my_wallet.stocks.crawler.BaseIEX.request')
+    def test_cached_response(self, mock_request):
+        mock_request.return_value.status_code = 200
+        mock_request.return_value.json.return_value = {'sector': 'Technology'}
+        self.assertEqual(CompanyIEX('AAPL').get_data(), {'sector': 'Technology'})
+        self.assertEqual(CompanyIEX('AAPL').get_data(), {'sector': 'Technology'})
+        self.assertEqual(mock_request.call_count, 1)
+        self.assertEqual(get_cache_stats(), {'hits': 1, 'misses': 1})
+
+    @mock.patch('my_wallet.stocks.crawler.BaseIEX.request')
+    def test_error_not_cached(self, mock_request):
+        for status_code, data in [(200, {}), (402, {'error': 'No credits'})]:
+            mock_request.return_value.status_code = status_code
+            mock_request.return_value.json.return_value = data
+            CompanyIEX('AAPL').get_data()
+        self.assertIsNone(caches['iex'].get(get_response_key(CompanyIEX('AAPL').url)))
+        self.assertEqual(mock_request.call_count, 2)
+
+    @mock.patch('my_wallet.stocks.crawler.BaseIEX.request')
+    def test_no_stats(self, mock_request):
+        mock_request.return_value.status_code = 200
+        mock_request.return_value.json.return_value = {'sector': 'Technology'}
+        CompanyIEX('AAPL').get_data()
+        CompanyIEX('AAPL').get_data()
+        self.assertEqual(get_cache_stats(), {'hits': 0, 'misses': 0})
+
+    @override_settings(IEX_CACHE_STATS=True)
+    @mock.patch('my_wallet.stocks.crawler.BaseIEX.download')
+    def test_not_cached_response(self, mock_download):
+        mock_download.return_value = []
+        PastIEX('AAPL').get_data()
+        PastIEX('AAPL').get_data()
+        self.assertEqual(mock_download.call_count, 2)
+        self.assertEqual(get_cache_stats(), {'hits': 0, 'misses': 0})
+
+
+class IterJsonArrayTest(SimpleTestCase):
+    data = [{'date': '2019-01-02', 'close': 101.5}, 12345, 'ą', [1, 2], {}]
+
+    def test_any_chunk_size(self):
+        body = json.dumps(self.data, ensure_ascii=False).encode()
+        for size in (1, 2, 7, len(body)):
+            chunks = [body[i:i + size] for i in range(0, len(body), size)]
+            self.assertEqual(list(iter_json_array(chunks)), self.data)
+
+    def test_empty_array(self):
+        self.assertEqual(list(iter_json_array([b' [ ', b'] '])), [])
+
+    def test_invalid(self):
+        for body in (b'{"error": 1}', b'[{"date": ', b'[1, 2'):
+            with self.assertRaises(ValueError):
+                list(iter_json_array([body]))
+
+
+class CrawlAllTest(SimpleTestCase):
+
+    class DummyCrawler:
+        timeout = 10
+
+        def __init__(self, result=None, event=None):
+            self.result = result
+            self.event = event
+
+        def get_data(self):
+            if self.event:
+                self.event.wait(5)
+            if isinstance(self.result, Exception):
+                raise self.result
+            return self.result
+
+    def test_crawl_all(self):
+        event = threading.Event()
+        crawlers = {
+            'google': self.DummyCrawler({1: 'news'}),
+            'yahoo': self.DummyCrawler({1: 'late'}, event=event),
+            'bing': self.DummyCrawler(AttributeError()),
+        }
+        try:
+            results, dropped = crawl_all(crawlers, deadline=0.2)
+        finally:
+            event.set()
+        self.assertEqual(results, {'google': {1: 'news'}})
+        self.assertCountEqual(dropped, ['yahoo', 'bing'])
+        self.assertEqual(crawlers['google'].timeout, 0.2)
+
+
+class ParseOnlyTest(SimpleTestCase):
+
+    def get_articles(self, crawler, fixture):
+        with open(os.path.join(FIXTURES, fixture), 'rb') as f:
+            content = f.read()
+        articles = crawler.get_articles(crawler.get_news(crawler.parse(content)))
+        parse_only, crawler.parse_only = crawler.parse_only, None
+        full_articles = crawler.get_articles(crawler.get_news(crawler.parse(content)))
+        crawler.parse_only = parse_only
+        return articles, full_articles
+
+    def test_google(self):
+        articles, full_articles = self.get_articles(GoogleCrawler('AAPL'), 'google_news.html')
+        self.assertEqual(len(articles), 10)
+        self.assertEqual(articles, full_articles)
+
+    def test_yahoo(self):
+        articles, full_articles = self.get_articles(YahooCrawler('AAPL'), 'yahoo_quote.html')
+        self.assertEqual(len(articles), 10)
+        self.assertEqual(articles, full_articles)
@@ -2,10 +2,12 @@ from datetime import datetime, timedelta
 from decimal import Decimal, ROUND_HALF_UP
 from django.core.cache import cache
 
+from django.db import IntegrityError, transaction
 from django.test import Client, TestCase, override_settings
 
 from my_wallet.stocks.models import (
-    Dividends, Financial, Prices, Stocks, find_quote_day
+    MOVERS_COUNT, MOVERS_KEY, Dividends, Financial, Prices, StockStatistics,
+    Stocks,
 )
 from unittest import mock
 
@@ -51,70 +53,46 @@ class StocksModelsTest(TestCase):
             stock=self.apple, payment=datetime(2018, 12, 13).date(),
             record=datetime(2018, 12, 11).date(), amount=10)
 
-    def test_find_quote_day(self):
-        date = datetime(2019, 7, 7)  # Saturday
-        actual = find_quote_day(date, days_ago=365)
-        expected = datetime(2018, 7, 6)  # Friday
-        self.assertEqual(actual, expected)
-
-        date = datetime(2019, 7, 8)  # Sunday
-        actual = find_quote_day(date, days_ago=365)
-        expected = datetime(2018, 7, 6)  # Friday
-        self.assertEqual(actual, expected)
-
-        date = datetime(2019, 7, 9)  # Monday
-        actual = find_quote_day(date, days_ago=365)
-        expected = datetime(2018, 7, 6)  # Friday
-        self.assertEqual(actual, expected)
-
-        date = datetime(2019, 7, 6)  # Friday
-        actual = find_quote_day(date, days_ago=365, type='later')
-        expected = datetime(2018, 7, 9)  # Monday
-        self.assertEqual(actual, expected)
-
-        date = datetime(2019, 7, 7)  # Saturday
-        actual = find_quote_day(date, days_ago=365, type='later')
-        expected = datetime(2018, 7, 9)  # Monday
-        self.assertEqual(actual, expected)
-
-        date = datetime(2019, 7, 8)  # Sunday
-        actual = find_quote_day(date, days_ago=365, type='later')
-        expected = datetime(2018, 7, 9)  # Monday
-        self.assertEqual(actual, expected)
-
-    @mock.patch('my_wallet.stocks.models.datetime')
-    @mock.patch('my_wallet.stocks.models.cache')
-    def test_stocks_manager_highest_dividends(self, mock_cache, mock_datetime):
-        mock_datetime.date.today.return_value = datetime(2018, 7, 6)
-        mock_datetime.timedelta.return_value = timedelta(days=1)
-
-        current_price = 100
-        mock_cache.get.return_value = current_price
-
-        expected = [{
-            'ticker': self.apple.ticker,
-            'sum_dividends': Decimal(25/current_price * 100)
-        }]
-        actual = Stocks.objects.highest_dividends()
-        self.assertEqual(actual, expected)
+    def test_stocks_manager_highest_dividends(self):
+        amazon = Stocks.objects.create(name='Amazon', ticker='AMZN')
+        Prices.objects.create(stock=amazon, price=50, date_price=datetime(2019, 1, 3).date())
+        Dividends.objects.create(
+            stock=amazon, payment=datetime(2018, 12, 1).date(),
+            record=datetime(2018, 11, 20).date(), amount=1)
+        google = Stocks.objects.create(name='Google', ticker='GOOGL')
+        Prices.objects.create(stock=google, price=1000, date_price=datetime(2019, 1, 3).date())
+        StockStatistics.objects.refresh(today=datetime(2019, 1, 4).date())
+
+        with self.assertNumQueries(1):
+            actual = Stocks.objects.highest_dividends()
+        self.assertEqual([line['ticker'] for line in actual], ['AAPL', 'AMZN'])
+        self.assertAlmostEqual(actual[0]['dividend_yield'], 25 / 104 * 100)
+        self.assertAlmostEqual(actual[1]['dividend_yield'], 2)
+        self.assertEqual(len(Stocks.objects.highest_dividends(limit=1)), 1)
+
+    def test_stocks_ticker_unique_ignoring_case(self):
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            Stocks.objects.create(name='Apple', ticker='AAPL')
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            Stocks.objects.create(name='Apple', ticker='aapl')
 
     def test_stocks_str(self):
         self.assertEqual(self.apple.__str__(), 'Apple')
 
-    @mock.patch('my_wallet.stocks.models.cache')
-    def test_stocks_properties(self, mock_cache):
-        options = {
-            'AAPL_price': 100, 'AAPL_day_change': 10,
-            'AAPL_percent_change': -10, 'AAPL_day_low': 90,
-            'AAPL_day_high': 110
+    @mock.patch('my_wallet.stocks.models.quote_store')
+    def test_stocks_properties(self, mock_quotes):
+        quote = {
+            'price': 100, 'day_change': 10, 'percent_change': -10,
+            'day_low': 90, 'day_high': 110
         }
-        mock_cache.get = lambda key: options[key]
+        mock_quotes.get.return_value = quote
 
-        self.assertEqual(self.apple.current_price, options['AAPL_price'])
-        self.assertEqual(self.apple.day_change, options['AAPL_day_change'])
-        self.assertEqual(self.apple.percent_change, options['AAPL_percent_change'])
-        self.assertEqual(self.apple.day_low, options['AAPL_day_low'])
-        self.assertEqual(self.apple.day_high, options['AAPL_day_high'])
+        self.assertEqual(self.apple.current_price, quote['price'])
+        self.assertEqual(self.apple.day_change, quote['day_change'])
+        self.assertEqual(self.apple.percent_change, quote['percent_change'])
+        self.assertEqual(self.apple.day_low, quote['day_low'])
+        self.assertEqual(self.apple.day_high, quote['day_high'])
+        mock_quotes.get.assert_called_once_with('AAPL')
 
     @mock.patch('my_wallet.stocks.models.datetime')
     def test_stocks_dividend_amount(self, mock_datetime):
@@ -134,33 +112,57 @@ class StocksModelsTest(TestCase):
         actual = self.apple.find_past_price(365)
         self.assertEqual(actual, expected.price)
 
+    def test_stocks_find_past_price_no_data(self):
+        amazon = Stocks.objects.create(name='Amazon', ticker='AMZN')
+        self.assertIsNone(amazon.find_past_price(365))
+
+    def test_prices_as_of(self):
+        with self.assertNumQueries(1):
+            price = Prices.objects.as_of(self.apple, datetime(2018, 12, 31).date())
+        self.assertEqual(price, self.price4)
+        price = Prices.objects.as_of(self.apple, datetime(2019, 1, 2).date())
+        self.assertEqual(price, self.price2)
+        self.assertIsNone(Prices.objects.as_of(self.apple, datetime(2017, 1, 1).date()))
+
+    def test_prices_as_of_all(self):
+        amazon = Stocks.objects.create(name='Amazon', ticker='AMZN')
+        amazon_price = Prices.objects.create(
+            stock=amazon, price=50, date_price=datetime(2018, 6, 1).date())
+        Stocks.objects.create(name='Google', ticker='GOOGL')
+        with self.assertNumQueries(1):
+            prices = list(Prices.objects.as_of_all(datetime(2019, 1, 2).date()))
+            tickers = [price.stock.ticker for price in prices]
+        self.assertEqual(prices, [self.price2, amazon_price])
+        self.assertEqual(tickers, ['AAPL', 'AMZN'])
+        prices = Prices.objects.as_of_all(datetime(2019, 1, 2).date(), tickers=['AMZN'])
+        self.assertEqual(list(prices), [amazon_price])
+
     def test_stocks_dividend_summarize(self):
-        dividend = self.apple.dividends.first()
-        first_element = {
-            'payment': dividend.payment,
-            'record': dividend.record,
-            'amount': dividend.amount,
-            'quarter': dividend.which_quarter()
-        }
-        actual = self.apple.dividends_summarize()
-        self.assertDictEqual(actual[0], first_element)
+        expected_rate = self.dividend.get_rate
+        with self.assertNumQueries(1):
+            actual = list(self.apple.dividends_summarize())
+            self.assertEqual(actual[0], self.dividend1)
+            self.assertEqual(actual[0].which_quarter(), '1Q 2019')
+            self.assertEqual(actual[1].get_rate, expected_rate)
+            self.assertEqual(actual[2].which_quarter(), '4Q 2018')
+            self.assertEqual(actual[2].get_rate, 'No data')
 
     def test_stocks_dividend_summarize_empty(self):
         self.apple = Stocks.objects.create(
             name='Google', ticker='GOOGL')
         actual = self.apple.dividends_summarize()
-        expected = []
-        self.assertListEqual(actual, expected)
+        self.assertFalse(actual.exists())
 
     @mock.patch('my_wallet.stocks.models.datetime')
     @mock.patch('my_wallet.stocks.models.timezone')
     def test_stocks_get_change(self, mock_timezone, mock_datetime):
-        mock_timezone.now.return_value.date.return_value = datetime(2019, 6, 6)
+        mock_timezone.now.return_value.date.return_value = datetime(2019, 6, 6).date()
         mock_datetime.timedelta.return_value = timedelta(days=365)
-        actual = self.apple.get_change(num_days=356)
-        expected_currency = 101 - 104
+        with self.assertNumQueries(2):
+            actual = self.apple.get_change(num_days=356)
+        expected_currency = 104 - 101
         self.assertEqual(actual['currency'], expected_currency)
-        expected_percent = (101 / 104 - 1) * 100
+        expected_percent = (104 / 101 - 1) * 100
         self.assertAlmostEqual(actual['percent'], Decimal(expected_percent))
 
     def test_stocks_get_change_no_data(self):
@@ -168,20 +170,90 @@ class StocksModelsTest(TestCase):
         expected = {'currency': 'No data', 'percent': 'no data'}
         self.assertEqual(amazon.get_change(365), expected)
 
+    def test_stocks_with_returns(self):
+        amazon = Stocks.objects.create(name='Amazon', ticker='AMZN')
+        Prices.objects.create(stock=amazon, price=50, date_price=datetime(2018, 12, 28).date())
+        Prices.objects.create(stock=amazon, price=55, date_price=datetime(2019, 1, 2).date())
+        Stocks.objects.create(name='Google', ticker='GOOGL')
+        with self.assertNumQueries(1):
+            rows = {
+                stock.ticker: stock for stock in
+                Stocks.objects.with_returns(['1d', 'ytd', '1y'], datetime(2019, 1, 2).date())
+            }
+        self.assertEqual(rows['AAPL'].end_price, 102)
+        self.assertEqual(rows['AAPL'].start_1d, 101)
+        self.assertAlmostEqual(rows['AAPL'].return_1y, (102 / 101 - 1) * 100)
+        self.assertEqual(rows['AMZN'].end_date, datetime(2019, 1, 2).date())
+        self.assertAlmostEqual(rows['AMZN'].return_ytd, 10)
+        self.assertIsNone(rows['AMZN'].start_1y)
+        self.assertIsNone(rows['AMZN'].return_1y)
+        self.assertIsNone(rows['GOOGL'].end_price)
+
+    def test_stocks_with_returns_unknown_horizon(self):
+        with self.assertRaises(ValueError):
+            Stocks.objects.with_returns(['2d'])
+
+    def test_statistics_refresh(self):
+        Stocks.objects.create(name='Amazon', ticker='AMZN')
+        with self.assertNumQueries(5):  # select, then delete and insert in a savepoint
+            count = StockStatistics.objects.refresh(today=datetime(2019, 1, 4).date())
+        self.assertEqual(count, 1)
+        statistics = self.apple.statistics
+        self.assertEqual(statistics.date, datetime(2019, 1, 3).date())
+        self.assertEqual(statistics.price, 104)
+        self.assertAlmostEqual(statistics.change_1d, (104 / 102 - 1) * 100)
+        for change in ['change_1w', 'change_1m', 'change_ytd', 'change_1y']:
+            self.assertAlmostEqual(getattr(statistics, change), (104 / 101 - 1) * 100)
+        self.assertEqual(statistics.year_change, 3)
+        self.assertEqual(statistics.high_52w, 104)
+        self.assertEqual(statistics.low_52w, 101)
+        self.assertEqual(statistics.avg_volume, 100_000)
+        self.assertEqual(statistics.dividends_sum, 25)
+
+    def test_statistics_refresh_replaces_old(self):
+        StockStatistics.objects.refresh(today=datetime(2019, 1, 4).date())
+        self.price3.delete()
+        StockStatistics.objects.refresh(today=datetime(2019, 1, 4).date())
+        self.assertEqual(StockStatistics.objects.get().price, 102)
+
+    def test_stocks_year_change(self):
+        self.assertEqual(self.apple.year_change, 'No data')
+        StockStatistics.objects.refresh(today=datetime(2019, 1, 4).date())
+        apple = Stocks.objects.select_related('statistics').get(ticker='AAPL')
+        with self.assertNumQueries(0):
+            self.assertEqual(apple.year_change, 3)
+            self.assertAlmostEqual(apple.perc_year_change, (104 / 101 - 1) * 100)
+
     def test_prices_order(self):
         actual = Prices.objects.all()
         expected = [self.price3, self.price2, self.price1, self.price4]
         self.assertEqual(list(actual), expected)
 
-    @mock.patch('my_wallet.stocks.models.find_quote_day')
-    def test_prices_year_change(self, find_quote_day):
-        find_quote_day.side_effect = [
-            datetime(2019, 1, 1).date(), datetime(2017, 12, 31).date()
-        ]
-        actual = Prices.objects.year_change()
-        perc_change = (self.price1.price / self.price4.price - 1) * 100
-        expected = [[self.apple.ticker, perc_change], ]
-        self.assertEqual(actual, expected)
+    def test_prices_year_change(self):
+        amazon = Stocks.objects.create(name='Amazon', ticker='AMZN')
+        # no prices on exact days, the last earlier ones are used
+        Prices.objects.create(stock=amazon, price=80, date_price=datetime(2017, 11, 20).date())
+        Prices.objects.create(stock=amazon, price=60, date_price=datetime(2018, 12, 27).date())
+        Stocks.objects.create(name='Google', ticker='GOOGL')
+        with self.assertNumQueries(1):
+            actual = Prices.objects.year_change(datetime(2019, 1, 3).date())
+        self.assertEqual([ticker for ticker, _ in actual], ['AMZN', 'AAPL'])
+        self.assertAlmostEqual(actual[0][1], (60 / 80 - 1) * 100)
+        self.assertAlmostEqual(actual[1][1], (104 / 101 - 1) * 100)
+
+    def test_prices_movers(self):
+        cache.delete(MOVERS_KEY)
+        self.addCleanup(cache.delete, MOVERS_KEY)
+        for i in range(12):
+            stock = Stocks.objects.create(name=f'Stock {i}', ticker=f'T{i:02}')
+            Prices.objects.create(stock=stock, price=100, date_price=datetime(2017, 12, 1).date())
+            Prices.objects.create(stock=stock, price=100 + i, date_price=datetime(2018, 12, 3).date())
+        movers = Prices.objects.refresh_movers(datetime(2019, 1, 3).date())
+        self.assertEqual(len(movers['rising']), MOVERS_COUNT)
+        self.assertEqual(movers['rising'][0][0], 'T11')
+        self.assertEqual(movers['falling'][0][0], 'T00')
+        with self.assertNumQueries(0):
+            self.assertEqual(Prices.objects.get_movers(), movers)
 
     def test_financial_properties(self):
         equity_expected = self.financial.assets - self.financial.liabilities
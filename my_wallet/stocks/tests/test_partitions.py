@@ -0,0 +1,72 @@
+from datetime import date
+
+from django.core.management import CommandError, call_command
+from django.db import IntegrityError, connection, transaction
+from django.test import TestCase
+
+from my_wallet.stocks.models import Prices, Stocks
+from my_wallet.stocks.partitions import (
+    MIN_VERSION, convert, create_partitions, get_bounds, get_partition_name,
+    get_partitions, is_partitioned,
+)
+
+
+class PartitionsTest(TestCase):
+
+    def test_get_partition_name(self):
+        self.assertEqual(get_partition_name(2019), 'stocks_prices_y2019')
+
+    def test_get_bounds(self):
+        self.assertEqual(get_bounds(2019), ('2019-01-01', '2020-01-01'))
+
+    def test_command_needs_postgresql(self):
+        with self.assertRaisesMessage(CommandError, 'PostgreSQL'):
+            call_command('partition_prices')
+        with self.assertRaisesMessage(CommandError, 'PostgreSQL'):
+            call_command('partition_prices', '--convert')
+
+    def test_command_ahead_not_negative(self):
+        with self.assertRaises(CommandError):
+            call_command('partition_prices', '--ahead', '-1')
+
+
+class ConvertTest(TestCase):
+    # DDL is rolled back after every test like other changes
+
+    def setUp(self):
+        if connection.vendor != 'postgresql' or connection.pg_version < MIN_VERSION:
+            self.skipTest('Partitioning needs PostgreSQL 11 or newer')
+        self.apple = Stocks.objects.create(name='Apple', ticker='AAPL')
+        amazon = Stocks.objects.create(name='Amazon', ticker='AMZN')
+        Prices.objects.bulk_create([
+            Prices(stock=self.apple, price=100, date_price=date(2018, 12, 31)),
+            Prices(stock=self.apple, price=110, date_price=date(2019, 1, 2)),
+            Prices(stock=amazon, price=50, date_price=date(2019, 1, 3)),
+        ])
+
+    def test_convert(self):
+        self.assertEqual(convert(2020), [get_partition_name(year) for year in (2018, 2019, 2020)])
+        with connection.cursor() as cursor:
+            self.assertTrue(is_partitioned(cursor))
+        self.assertEqual(Prices.objects.count(), 3)
+        self.assertEqual(Prices.objects.as_of(self.apple, date(2019, 1, 1)).price, 100)
+        self.assertEqual(Prices.objects.as_of(self.apple, date(2019, 6, 1)).price, 110)
+
+        Prices.objects.create(stock=self.apple, price=120, date_price=date(2019, 1, 3))
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            Prices.objects.create(stock=self.apple, price=120, date_price=date(2019, 1, 3))
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            Prices.objects.create(stock=self.apple, price=120, date_price=date(2019, 1, 4), volume=-1)
+
+    def test_create_partitions(self):
+        convert(2019)
+        # rows out of all partitions are moved from the default one
+        Prices.objects.create(stock=self.apple, price=130, date_price=date(2021, 1, 4))
+        self.assertEqual(create_partitions(2019, 2021), ['stocks_prices_y2020', 'stocks_prices_y2021'])
+        with connection.cursor() as cursor:
+            self.assertIn('stocks_prices_y2021', get_partitions(cursor))
+            cursor.execute('SELECT COUNT(*) FROM stocks_prices_y2021')
+            self.assertEqual(cursor.fetchone()[0], 1)
+            cursor.execute('SELECT COUNT(*) FROM stocks_prices_default')
+            self.assertEqual(cursor.fetchone()[0], 0)
+        self.assertEqual(Prices.objects.as_of(self.apple, date(2021, 2, 1)).price, 130)
@@ -0,0 +1,73 @@
+import json
+import time
+
+from django.test import SimpleTestCase
+
+from my_wallet.stocks.quotes import QuoteStore, make_quote
+
+
+class QuoteStoreTest(SimpleTestCase):
+
+    def setUp(self):
+        self.store = QuoteStore(key='test_quotes', batch_size=2, timeout=60)
+        self.store.clear()
+        self.addCleanup(self.store.clear)
+
+    def test_make_quote(self):
+        data = {'latestPrice': 100, 'change': 1, 'changePercent': 0.01, 'low': 99}
+        expected = {
+            'price': 100, 'day_change': 1, 'percent_change': 1,
+            'day_low': 99, 'day_high': 'no data',
+        }
+        self.assertEqual(make_quote(data), expected)
+        self.assertEqual(make_quote({})['percent_change'], 'no data')
+
+    def test_set_and_get_many(self):
+        quotes = {f'T{i}': {'price': i, 'day_change': -i} for i in range(5)}
+        self.store.set_many(quotes)
+        actual = self.store.get_many(['T0', 'T4', 'UNKNOWN'])
+        self.assertEqual(actual['UNKNOWN'], {})
+        updated = actual['T0'].pop('updated')
+        self.assertAlmostEqual(updated, time.time(), delta=5)
+        self.assertEqual(actual['T0'], quotes['T0'])
+        self.assertEqual(actual['T4'], dict(quotes['T4'], updated=updated))
+        self.assertEqual(self.store.get('T3'), dict(quotes['T3'], updated=updated))
+        self.assertEqual(self.store.get_many([]), {})
+
+    def test_get_many_one_command(self):
+        self.store.set_many({'AAPL': {'price': 1}, 'AMZN': {'price': 2}})
+        connection = self.store.connection
+        commands = []
+        original = connection.execute_command
+
+        def execute_command(*args, **kwargs):
+            commands.append(args[0])
+            return original(*args, **kwargs)
+
+        connection.execute_command = execute_command
+        try:
+            self.store.get_many(['AAPL', 'AMZN'] * 5)
+        finally:
+            del connection.execute_command
+        self.assertEqual(commands, ['HMGET'])
+
+    def test_timeout(self):
+        self.store.set_many({'AAPL': {'price': 1}})
+        self.assertGreater(self.store.connection.ttl(self.store.key), 0)
+
+    def test_delete(self):
+        self.store.set_many({f'T{i}': {'price': i} for i in range(5)})
+        self.store.delete(['T0', 'T1', 'T2'])
+        self.assertEqual(self.store.connection.hkeys(self.store.key), [b'T3', b'T4'])
+
+    def test_old_snapshot(self):
+        self.store.set_many({'AAPL': {'price': 1}, 'AMZN': {'price': 2}})
+        old = json.dumps({'price': 3, 'updated': time.time() - 61})
+        self.store.connection.hset(self.store.key, 'AMZN', old)
+        quotes = self.store.get_many(['AAPL', 'AMZN'])
+        self.assertEqual(quotes['AAPL']['price'], 1)
+        self.assertEqual(quotes['AMZN'], {})
+
+    def test_key_prefix(self):
+        self.assertNotEqual(self.store.key, 'test_quotes')
+        self.assertTrue(self.store.key.endswith(':test_quotes'))
@@ -0,0 +1,50 @@
+import time
+from email.utils import formatdate
+
+from django.test import SimpleTestCase
+from unittest import mock
+
+from my_wallet.stocks.ratelimit import RateLimitExceeded, TokenBucket, parse_retry_after
+
+
+class TokenBucketTest(SimpleTestCase):
+
+    def setUp(self):
+        self.bucket = TokenBucket(key='test_rate_limit', rate=10, burst=5, max_wait=0)
+        self.bucket.script.registered_client.delete(self.bucket.key)
+
+    def test_acquire(self):
+        self.bucket.acquire(weight=3)
+        self.bucket.acquire(weight=2)
+        with self.assertRaises(RateLimitExceeded) as error:
+            self.bucket.acquire(weight=2)
+        self.assertGreater(error.exception.retry_after, 0)
+
+    @mock.patch('my_wallet.stocks.ratelimit.time.sleep')
+    def test_acquire_waits(self, mock_sleep):
+        self.bucket.max_wait = 1
+        self.bucket.acquire(weight=5)
+        with mock.patch.object(self.bucket, 'try_acquire', side_effect=[0.2, 0]):
+            self.bucket.acquire(weight=2)
+        mock_sleep.assert_called_once_with(0.2)
+
+    def test_disabled(self):
+        self.bucket.rate = 0
+        with mock.patch.object(self.bucket, 'try_acquire') as mock_try:
+            self.bucket.acquire(weight=100)
+        mock_try.assert_not_called()
+
+
+class ParseRetryAfterTest(SimpleTestCase):
+
+    def test_seconds(self):
+        self.assertEqual(parse_retry_after('2.5'), 2.5)
+        self.assertEqual(parse_retry_after(None), 1)
+
+    def test_http_date(self):
+        value = formatdate(time.time() + 30, usegmt=True)
+        self.assertAlmostEqual(parse_retry_after(value), 30, delta=2)
+        self.assertEqual(parse_retry_after('Wed, 21 Oct 2015 07:28:00 GMT'), 0)
+
+    def test_invalid(self):
+        self.assertEqual(parse_retry_after('soon'), 1)
@@ -0,0 +1,33 @@
+from datetime import date
+
+from django.test import SimpleTestCase
+
+from my_wallet.stocks.standin import get_payload
+
+
+class StandInTest(SimpleTestCase):
+    today = date(2019, 7, 15)
+
+    def test_batch(self):
+        query = {'symbols': ['aapl,AMZN'], 'types': ['quote']}
+        actual = get_payload('/stock/market/batch', query, self.today)
+        self.assertEqual(set(actual), {'AAPL', 'AMZN'})
+        self.assertEqual(actual['AAPL']['quote']['symbol'], 'AAPL')
+
+    def test_chart(self):
+        bars = get_payload('/stock/AAPL/chart/5d', {}, self.today)
+        self.assertEqual(len(bars), 5)
+        self.assertEqual(bars[-1]['date'], '2019-07-15')
+        self.assertEqual(bars, get_payload('/stock/AAPL/chart/5d', {}, self.today))
+
+    def test_endpoints(self):
+        book = get_payload('/stock/AAPL/book', {}, self.today)
+        self.assertIn('latestPrice', book['quote'])
+        financials = get_payload('/stock/AAPL/financials/4', {}, self.today)
+        self.assertEqual(len(financials['financials']), 4)
+        dividends = get_payload('/stock/AAPL/dividends/1y', {}, self.today)
+        self.assertEqual(len(dividends), 4)
+
+    def test_unknown_path(self):
+        with self.assertRaises(KeyError):
+            get_payload('/ref-data/symbols', {}, self.today)
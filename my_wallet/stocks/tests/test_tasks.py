@@ -1,10 +1,11 @@
 from datetime import datetime
 
+from celery.exceptions import Retry
 from django.test import TestCase
 from unittest import mock
 
-from my_wallet.stocks.tasks import update_stock_price
-from my_wallet.stocks.models import Stocks, Prices
+from my_wallet.stocks.tasks import add_stocks, update_stock_price
+from my_wallet.stocks.models import Stocks, Prices, StockStatistics
 
 
 class TasksTest(TestCase):
@@ -19,26 +20,42 @@ class TasksTest(TestCase):
             'changePercent': 0.01
         }
 
-    @mock.patch('my_wallet.stocks.tasks.requests')
-    def test_stock_update(self, mock_request):
+    @mock.patch('my_wallet.stocks.tasks.BatchPreviousIEX.get_data')
+    def test_stock_update(self, mock_data):
         Stocks.objects.create(name='Apple', ticker='AAPL')
-        mock_request.get.return_value.status_code = 200
-        mock_request.get.return_value.json.return_value = self.data
+        mock_data.return_value = {'AAPL': self.data}
         update_stock_price()
         self.assertEqual(Prices.objects.count(), 1)
         apple = Prices.objects.get(stock__ticker='AAPL')
         self.assertEqual(apple.stock, Stocks.objects.first())
         self.assertEqual(apple.price, self.data['close'])
         self.assertEqual(apple.date_price, datetime(2019, 10, 10).date())
+        statistics = StockStatistics.objects.get(stock__ticker='AAPL')
+        self.assertEqual(statistics.price, self.data['close'])
 
-    @mock.patch('my_wallet.stocks.tasks.requests')
-    def test_stock_no_data(self, mock_request):
+    @mock.patch('my_wallet.stocks.tasks.BatchPreviousIEX.get_data')
+    def test_stock_update_rerun(self, mock_data):
+        Stocks.objects.create(name='Apple', ticker='AAPL')
+        mock_data.return_value = {'AAPL': self.data}
+        update_stock_price()
+        update_stock_price()
+        self.assertEqual(Prices.objects.count(), 1)
+
+    @mock.patch('my_wallet.stocks.tasks.BatchPreviousIEX.get_data')
+    def test_stock_no_data(self, mock_data):
         Stocks.objects.create(name='Amazon', ticker='AMZN')
-        mock_request.get.return_value.status_code = 404
-        mock_request.get.return_value.json.return_value = self.data
+        mock_data.return_value = {'AMZN': {}}
         update_stock_price()
         prices = Prices.objects.filter(stock__ticker='AMZN')
-        self.assertTrue(prices.exists())
-        amazon = prices.first()
-        self.assertEqual(amazon.price, None)
-        self.assertTrue(amazon.date_price, datetime.now().date())
+        self.assertFalse(prices.exists())
+
+    @mock.patch('my_wallet.stocks.tasks.add_stocks.retry', side_effect=Retry)
+    @mock.patch('my_wallet.stocks.tasks.add_many_stocks')
+    def test_add_stocks_rate_limited(self, mock_add, mock_retry):
+        mock_add.return_value = {
+            'added': ['AAPL'], 'failed': ['XXX'],
+            'rate_limited': ['AMZN', 'IBM'], 'retry_after': 2.5,
+        }
+        with self.assertRaises(Retry):
+            add_stocks(['AAPL', 'AMZN', 'IBM', 'XXX'])
+        mock_retry.assert_called_once_with(args=(['AMZN', 'IBM'], ), countdown=2.5)
@@ -0,0 +1,79 @@
+from datetime import date
+
+import numpy as np
+from django.test import SimpleTestCase
+
+from my_wallet.stocks.trading_calendar import (
+    TradingCalendar, calendar, get_easter, get_holidays,
+)
+
+
+class HolidaysTest(SimpleTestCase):
+
+    def test_get_easter(self):
+        self.assertEqual(get_easter(2019), date(2019, 4, 21))
+        self.assertEqual(get_easter(2024), date(2024, 3, 31))
+
+    def test_get_holidays(self):
+        expected = [
+            date(2019, 1, 1), date(2019, 1, 21), date(2019, 2, 18),
+            date(2019, 4, 19), date(2019, 5, 27), date(2019, 7, 4),
+            date(2019, 9, 2), date(2019, 11, 28), date(2019, 12, 25),
+        ]
+        self.assertEqual(get_holidays(2019), expected)
+
+    def test_observed_holidays(self):
+        holidays = get_holidays(2021)
+        self.assertIn(date(2021, 7, 5), holidays)  # 4th of July on Sunday
+        self.assertIn(date(2021, 12, 24), holidays)  # Christmas on Saturday
+        # New Year's Day 2022 on Saturday is not observed
+        self.assertNotIn(date(2021, 12, 31), holidays)
+        self.assertIn(date(2022, 6, 20), get_holidays(2022))  # Juneteenth
+
+
+class TradingCalendarTest(SimpleTestCase):
+
+    def test_is_trading_day(self):
+        self.assertTrue(calendar.is_trading_day(date(2019, 7, 5)))
+        self.assertFalse(calendar.is_trading_day(date(2019, 7, 4)))
+        self.assertFalse(calendar.is_trading_day(date(2019, 7, 6)))
+
+    def test_previous_session(self):
+        self.assertEqual(calendar.previous_session(date(2019, 7, 8)), date(2019, 7, 5))
+        self.assertEqual(calendar.previous_session(date(2019, 7, 7)), date(2019, 7, 5))
+        self.assertEqual(calendar.previous_session(date(2019, 7, 5)), date(2019, 7, 3))
+        self.assertEqual(
+            calendar.previous_session(date(2019, 7, 5), include=True), date(2019, 7, 5))
+
+    def test_next_session(self):
+        self.assertEqual(calendar.next_session(date(2019, 7, 3)), date(2019, 7, 5))
+        self.assertEqual(calendar.next_session(date(2019, 7, 5)), date(2019, 7, 8))
+        self.assertEqual(
+            calendar.next_session(date(2019, 7, 6), include=True), date(2019, 7, 8))
+        self.assertEqual(
+            calendar.next_session(date(2019, 7, 5), include=True), date(2019, 7, 5))
+
+    def test_sessions_ago(self):
+        self.assertEqual(calendar.sessions_ago(date(2019, 7, 7), 0), date(2019, 7, 5))
+        self.assertEqual(calendar.sessions_ago(date(2019, 7, 7), 2), date(2019, 7, 2))
+
+    def test_count_sessions(self):
+        self.assertEqual(calendar.count_sessions(date(2019, 1, 1), date(2020, 1, 1)), 252)
+        starts = np.array(['2019-07-01', '2019-07-06'], dtype='datetime64[D]')
+        ends = np.array(['2019-07-08', '2019-07-09'], dtype='datetime64[D]')
+        np.testing.assert_array_equal(calendar.count_sessions(starts, ends), [4, 1])
+
+    def test_get_sessions(self):
+        expected = [date(2019, 7, 3), date(2019, 7, 5), date(2019, 7, 8)]
+        self.assertEqual(calendar.get_sessions(date(2019, 7, 3), date(2019, 7, 8)), expected)
+
+    def test_out_of_range(self):
+        small = TradingCalendar(date(2019, 1, 1), date(2019, 12, 31))
+        self.assertIsNone(small.previous_session(date(2018, 12, 31)))
+        self.assertIsNone(small.previous_session(date(2019, 1, 2)))
+        self.assertEqual(small.previous_session(date(2020, 1, 2)), date(2019, 12, 31))
+        self.assertIsNone(small.next_session(date(2019, 12, 31)))
+        self.assertIsNone(small.next_session(date(2020, 1, 2)))
+        self.assertEqual(small.next_session(date(2018, 12, 31)), date(2019, 1, 2))
+        with self.assertRaises(ValueError):
+            small.count_sessions(date(2018, 1, 1), date(2019, 2, 1))
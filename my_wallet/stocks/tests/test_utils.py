@@ -1,9 +1,15 @@
-from datetime import datetime
+import io
+import json
+import time
+from datetime import datetime, timedelta
 
-from django.test import TestCase
+from django.test import TestCase, override_settings
 from unittest import mock
 
-from my_wallet.stocks.utils import StockMaker
+import requests
+
+from my_wallet.stocks.ratelimit import RateLimitExceeded
+from my_wallet.stocks.utils import StockMaker, add_many_stocks, sync_all_past_data
 from my_wallet.stocks.models import Stocks, StockDetail, Dividends, Financial, Prices
 
 
@@ -63,19 +69,153 @@ class StockMakerTest(TestCase):
         self.assertEqual(financial.assets, 1_000_000)
         self.assertEqual(financial.net_income, 50_000)
 
-    @mock.patch('my_wallet.stocks.utils.PastIEX.get_data')
+    @mock.patch('my_wallet.stocks.utils.PastIEX.iter_chunks')
     def test_add_past_data(self, mock_data):
         Stocks.objects.create(name='Apple', ticker='AAPL')
-        mock_data.return_value = [{
+        mock_data.return_value = [[{
             'close': 100,
             'date': '2019-01-01',
             'open': 109,
             'volume': 100_000,
             'change': 1,
             'changePercent': 1,
-        }]
+        }]]
         StockMaker('AAPL').add_past_data()
         prices = Prices.objects.first()
         self.assertEqual(prices.stock.ticker, 'AAPL')
         self.assertEqual(prices.price, 100)
         self.assertEqual(prices.date_price, datetime(2019, 1, 1).date())
+
+    @override_settings(BULK_BATCH_SIZE=500)
+    @mock.patch('my_wallet.stocks.utils.PastIEX.request')
+    def test_add_past_data_bulk(self, mock_request):
+        Stocks.objects.create(name='Apple', ticker='AAPL')
+        start = datetime(2014, 1, 1).date()
+        prices = [
+            {'close': 100, 'date': str(start + timedelta(days=i))}
+            for i in range(1260)
+        ]
+        body = json.dumps(prices).encode()
+        response = mock_request.return_value.__enter__.return_value
+        response.iter_content.return_value = [body[i:i + 1000] for i in range(0, len(body), 1000)]
+        # savepoint, get stock, 3 inserts, release savepoint
+        with self.assertNumQueries(6):
+            StockMaker('AAPL').add_past_data()
+        self.assertEqual(Prices.objects.count(), 1260)
+
+    @mock.patch('my_wallet.stocks.utils.timezone')
+    @mock.patch('my_wallet.stocks.utils.PastIEX')
+    def test_sync_past_data(self, mock_past, mock_timezone):
+        mock_timezone.now.return_value.date.return_value = datetime(2019, 1, 10).date()
+        mock_past.get_range.return_value = '5d'
+        apple = Stocks.objects.create(name='Apple', ticker='AAPL')
+        Prices.objects.create(stock=apple, price=99, date_price=datetime(2019, 1, 4).date())
+        Prices.objects.create(stock=apple, price=99, date_price=datetime(2019, 1, 8).date())
+        mock_past.return_value.iter_chunks.return_value = [[
+            {'close': 100, 'date': '2019-01-04'},
+            {'close': 101, 'date': '2019-01-07'},
+            {'close': 102, 'date': '2019-01-08'},
+            {'close': 103, 'date': '2019-01-09'},
+            {'close': None, 'date': '2019-01-10'},
+        ]]
+        actual = StockMaker('AAPL').sync_past_data(datetime(2019, 1, 4).date())
+        self.assertEqual(actual, 2)
+        mock_past.assert_called_once_with('AAPL', '5d')
+        dates = apple.past.order_by('date_price').values_list('date_price', flat=True)
+        self.assertEqual(len(dates), 4)
+        self.assertEqual(dates[3], datetime(2019, 1, 9).date())
+
+    @mock.patch('my_wallet.stocks.utils.timezone')
+    @mock.patch('my_wallet.stocks.utils.PastIEX.iter_chunks')
+    def test_sync_past_data_up_to_date(self, mock_data, mock_timezone):
+        mock_timezone.now.return_value.date.return_value = datetime(2019, 1, 10).date()
+        apple = Stocks.objects.create(name='Apple', ticker='AAPL')
+        Prices.objects.create(stock=apple, price=99, date_price=datetime(2019, 1, 10).date())
+        self.assertEqual(StockMaker('AAPL').sync_past_data(), 0)
+        mock_data.assert_not_called()
+
+    @mock.patch('my_wallet.stocks.utils.StockMaker.sync_past_data')
+    def test_sync_all_past_data_errors(self, mock_sync):
+        for ticker in ['AAPL', 'AMZN', 'IBM']:
+            Stocks.objects.create(name=ticker, ticker=ticker)
+        mock_sync.side_effect = [requests.Timeout, TypeError, 5]
+        self.assertEqual(sync_all_past_data(), 5)
+        self.assertEqual(mock_sync.call_count, 3)
+
+
+@mock.patch('my_wallet.stocks.utils.PastIEX.get_file', side_effect=lambda: io.BytesIO(b'[]'))
+@mock.patch('my_wallet.stocks.utils.FinancialIEX.get_data', return_value=[])
+@mock.patch('my_wallet.stocks.utils.DividendsIEX.get_data', return_value=[])
+@mock.patch('my_wallet.stocks.utils.CompanyIEX.get_data')
+class AddManyStocksTest(TestCase):
+
+    def test_add_many_stocks(self, mock_company, *args):
+        names = {'AAPL': 'Apple', 'AMZN': 'Amazon'}
+
+        def quotes(crawler):
+            ticker = crawler.url.split('/')[5]
+            return {'companyName': names[ticker], 'symbol': ticker}
+
+        mock_company.return_value = {
+            'sector': 'Technology', 'industry': 'IT',
+            'description': 'Best company ever',
+        }
+        Stocks.objects.create(name='Google', ticker='GOOGL')
+
+        with mock.patch('my_wallet.stocks.utils.QuotesIEX.get_data',
+                        autospec=True, side_effect=quotes):
+            results = add_many_stocks(['aapl', 'AMZN', 'GOOGL'], max_workers=2)
+        self.assertCountEqual(results['added'], ['AAPL', 'AMZN'])
+        self.assertEqual(results['failed'], [])
+        self.assertEqual(Stocks.objects.count(), 3)
+        self.assertEqual(StockDetail.objects.count(), 2)
+
+    @mock.patch('my_wallet.stocks.utils.QuotesIEX.get_data')
+    def test_failed_download(self, mock_quotes, mock_company, *args):
+        mock_quotes.return_value = {'companyName': 'Apple', 'symbol': 'AAPL'}
+        mock_company.side_effect = ValueError('Something is wrong with request')
+
+        results = add_many_stocks(['AAPL'], max_workers=2)
+        self.assertEqual(results['added'], [])
+        self.assertEqual(results['failed'], ['AAPL'])
+        self.assertEqual(results['rate_limited'], [])
+        self.assertFalse(Stocks.objects.exists())
+
+    @mock.patch('my_wallet.stocks.utils.QuotesIEX.get_data')
+    def test_failed_download_closes_file(self, mock_quotes, mock_company, *args):
+        prices = io.BytesIO(b'[]')
+        mock_quotes.return_value = {'companyName': 'Apple', 'symbol': 'AAPL'}
+
+        def company():
+            # prices are downloaded before company fails
+            time.sleep(0.1)
+            raise ValueError('Something is wrong with request')
+
+        mock_company.side_effect = company
+
+        with mock.patch('my_wallet.stocks.utils.PastIEX.get_file', return_value=prices):
+            add_many_stocks(['AAPL'], max_workers=5)
+        self.assertTrue(prices.closed)
+
+    @mock.patch('my_wallet.stocks.utils.QuotesIEX.get_data')
+    def test_failed_download_cancels_requests(self, mock_quotes, mock_company, mock_dividends,
+                                              mock_financial, mock_file):
+        # the only worker is busy, so other requests of AAPL have not started
+        mock_quotes.side_effect = ValueError('Something is wrong with request')
+        mock_company.side_effect = lambda: time.sleep(0.2) or {}
+
+        results = add_many_stocks(['AAPL'], max_workers=1)
+        self.assertEqual(results['failed'], ['AAPL'])
+        mock_dividends.assert_not_called()
+        mock_financial.assert_not_called()
+        mock_file.assert_not_called()
+
+    @mock.patch('my_wallet.stocks.utils.QuotesIEX.get_data')
+    def test_rate_limited_download(self, mock_quotes, mock_company, *args):
+        mock_quotes.return_value = {'companyName': 'Apple', 'symbol': 'AAPL'}
+        mock_company.side_effect = RateLimitExceeded(3)
+
+        results = add_many_stocks(['AAPL'], max_workers=2)
+        self.assertEqual(results['failed'], [])
+        self.assertEqual(results['rate_limited'], ['AAPL'])
+        self.assertEqual(results['retry_after'], 3)
@@ -1,13 +1,17 @@
 import csv
 import io
 
+from django.core.cache import cache
 from django.test import Client, TestCase
 from django.urls import reverse
-from datetime import datetime
+from django.utils import timezone
+from datetime import datetime, timedelta
 from django.views.generic import TemplateView
 from unittest import mock
 
-from ..models import Stocks, Dividends, Prices, Financial
+from ..models import Stocks, Dividends, Prices, Financial, StockStatistics
+from ..news import refresh_news
+from ..quotes import QuoteStore
 from my_wallet.stocks.views import (
     SideBarMixin, FinancialChartMixin, PriceChartMixin)
 
@@ -62,15 +66,14 @@ class StocksViewMixinsTest(TestCase):
     class DummyView(SideBarMixin, TemplateView):
             pass
 
-    @mock.patch('my_wallet.stocks.views.cache')
-    def test_side_bar_mixin(self, mock_cache):
+    @mock.patch('my_wallet.stocks.views.quote_store')
+    def test_side_bar_mixin(self, mock_quotes):
         Stocks.objects.create(name='Apple', ticker='AAPL')
-        options = {
-            'AAPL_price': 100,
-            'AAPL_day_change': 10,
-            'AAPL_percent_change': -10
+        mock_quotes.get.return_value = {
+            'price': 100,
+            'day_change': 10,
+            'percent_change': -10
         }
-        mock_cache.get = lambda key, default: options[key]
 
         dummy_view = self.DummyView()
         dummy_view.kwargs = {'ticker': 'AAPL'}
@@ -141,6 +144,21 @@ class StockListViewTest(TestCase):
         response = self.client.get(url)
         self.assertEqual(response.status_code, 200)
 
+    @mock.patch.object(QuoteStore, 'get')
+    @mock.patch.object(QuoteStore, 'get_many', autospec=True)
+    def test_page_quotes(self, mock_get_many, mock_get):
+        for i in range(12):
+            Stocks.objects.create(name=f'Stock {i}', ticker=f'T{i:02}')
+        mock_get_many.side_effect = lambda store, tickers: {
+            ticker: {'price': 123.45, 'day_low': 120} for ticker in tickers
+        }
+        response = self.client.get(reverse('stocks:list'))
+        self.assertContains(response, '123,45 USD', count=10)
+        self.assertEqual(mock_get_many.call_count, 1)
+        mock_get.assert_not_called()
+        for stock in response.context['stocks']:
+            self.assertEqual(stock.day_low, 120)
+
 
 class StockDetailViewTest(TestCase):
     def setUp(self):
@@ -164,19 +182,90 @@ class StockDetailViewTest(TestCase):
         url = reverse('stocks:detail', kwargs={'ticker': 'AAPL'})
         response = self.client.get(url)
         self.assertEqual(response.status_code, 200)
+        self.assertIsNone(response.context['statistics'])
+
+    def test_dividends_pagination(self):
+        for year in range(1990, 2020):
+            for month in [3, 6, 9, 12]:
+                Dividends.objects.create(
+                    stock=self.stock, amount=1,
+                    record=f'{year}-{month:02}-01', payment=f'{year}-{month:02}-15')
+        Prices.objects.create(stock=self.stock, price=50, date_price='2019-12-01')
+        url = reverse('stocks:detail', kwargs={'ticker': 'AAPL'})
+        response = self.client.get(url)
+        rows = response.context['object_list']
+        self.assertEqual(len(rows), 10)
+        self.assertEqual(rows[0].quarter, '4Q 2019')
+        self.assertEqual(rows[0].get_rate, 2)
+        self.assertEqual(rows[1].get_rate, 'No data')
+        self.assertEqual(response.context['paginator'].count, 121)
+
+    def test_statistics(self):
+        Prices.objects.create(stock=self.stock, price=150, date_price='2019-10-10')
+        StockStatistics.objects.refresh()
+        url = reverse('stocks:detail', kwargs={'ticker': 'AAPL'})
+        response = self.client.get(url)
+        self.assertEqual(response.context['statistics'].price, 150)
+        self.assertContains(response, 'Ostatnie 52 tygodnie')
 
 
 class ArticleViewTest(TestCase):
-
-    @mock.patch('my_wallet.stocks.views.YahooCrawler.get_data')
-    @mock.patch('my_wallet.stocks.views.GoogleCrawler.get_data')
-    def test_status_code(self, mock_google, mock_yahoo):
+    def setUp(self):
         Stocks.objects.create(name='Apple', ticker='AAPL')
-        mock_google.return_value = 'Hi there. I am Google Crawler'
-        mock_yahoo.return_value = 'Hi there. I am YahooCrawler'
-
-        url = reverse('stocks:articles', kwargs={'ticker': 'AAPL'})
-        response = self.client.get(url)
+        cache.delete_many(['news_AAPL', 'news_AAPL_lock'])
+        self.url = reverse('stocks:articles', kwargs={'ticker': 'AAPL'})
+
+    @mock.patch('my_wallet.stocks.tasks.refresh_stock_news.delay')
+    def test_status_code(self, mock_refresh):
+        cache.set('news_AAPL', {
+            'google': 'Hi there. I am Google Crawler',
+            'yahoo': 'Hi there. I am YahooCrawler',
+            'updated': timezone.now(),
+        })
+        response = self.client.get(self.url)
         self.assertEqual(response.status_code, 200)
         self.assertEqual(response.context['google_news'], 'Hi there. I am Google Crawler')
         self.assertEqual(response.context['yahoo_news'], 'Hi there. I am YahooCrawler')
+        mock_refresh.assert_not_called()
+
+    @mock.patch('my_wallet.stocks.tasks.refresh_stock_news.delay')
+    def test_cold_cache(self, mock_refresh):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context['google_news'], {})
+        self.client.get(self.url)
+        mock_refresh.assert_called_once_with('AAPL')
+
+    @mock.patch('my_wallet.stocks.tasks.refresh_stock_news.delay')
+    def test_stale_news(self, mock_refresh):
+        cache.set('news_AAPL', {
+            'google': 'old', 'yahoo': 'old',
+            'updated': timezone.now() - timedelta(days=1),
+        })
+        response = self.client.get(self.url)
+        self.assertEqual(response.context['google_news'], 'old')
+        mock_refresh.assert_called_once_with('AAPL')
+
+    @mock.patch('my_wallet.stocks.news.YahooCrawler.get_data')
+    @mock.patch('my_wallet.stocks.news.GoogleCrawler.get_data')
+    def test_refresh_news(self, mock_google, mock_yahoo):
+        mock_google.return_value = {1: {'title': 'Google'}}
+        mock_yahoo.return_value = {1: {'title': 'Yahoo'}}
+        cache.set('news_AAPL_lock', 1)
+        refresh_news('AAPL')
+        self.assertEqual(cache.get('news_AAPL')['google'], {1: {'title': 'Google'}})
+        self.assertIsNone(cache.get('news_AAPL_lock'))
+
+    @mock.patch('my_wallet.stocks.news.YahooCrawler.get_data')
+    @mock.patch('my_wallet.stocks.news.GoogleCrawler.get_data')
+    def test_refresh_news_dropped(self, mock_google, mock_yahoo):
+        cache.set('news_AAPL', {
+            'google': {1: {'title': 'Old Google'}}, 'yahoo': {1: {'title': 'Old Yahoo'}},
+            'dropped': [], 'updated': timezone.now() - timedelta(days=1),
+        })
+        mock_google.side_effect = ValueError
+        mock_yahoo.return_value = {1: {'title': 'Yahoo'}}
+        news = refresh_news('AAPL')
+        self.assertEqual(news['dropped'], ['google'])
+        self.assertEqual(cache.get('news_AAPL')['google'], {1: {'title': 'Old Google'}})
+        self.assertEqual(cache.get('news_AAPL')['yahoo'], {1: {'title': 'Yahoo'}})
@@ -0,0 +1,167 @@
+"""
+Trading calendar of US exchanges (NYSE rules). Sessions between FIRST_DAY
+and LAST_DAY are precomputed once, so finding previous or next session is
+an index lookup and counting sessions works on whole NumPy arrays of dates.
+"""
+import datetime
+
+import numpy as np
+
+FIRST_DAY = datetime.date(1980, 1, 1)
+LAST_DAY = datetime.date(2060, 12, 31)
+
+
+def get_easter(year):
+    # anonymous Gregorian algorithm
+    a = year % 19
+    b, c = divmod(year, 100)
+    d, e = divmod(b, 4)
+    f = (b + 8) // 25
+    g = (b - f + 1) // 3
+    h = (19 * a + b - d - g + 15) % 30
+    i, k = divmod(c, 4)
+    l = (32 + 2 * e + 2 * i - h - k) % 7
+    m = (a + 11 * h + 22 * l) // 451
+    month, day = divmod(h + l - 7 * m + 114, 31)
+    return datetime.date(year, month, day + 1)
+
+
+def get_weekday(year, month, weekday, number):
+    """
+    :param weekday: 0 - Monday, ..., 6 - Sunday: int
+    :param number: 1 - the first one in month, -1 - the last one: int
+    """
+    if number > 0:
+        day = datetime.date(year, month, 1)
+        day += datetime.timedelta(days=(weekday - day.weekday()) % 7)
+        return day + datetime.timedelta(weeks=number - 1)
+    next_month = datetime.date(year + month // 12, month % 12 + 1, 1)
+    day = next_month - datetime.timedelta(days=1)
+    return day - datetime.timedelta(days=(day.weekday() - weekday) % 7)
+
+
+def get_observed(day):
+    # holiday on Saturday is observed on Friday, on Sunday - on Monday
+    if day.weekday() == 5:
+        return day - datetime.timedelta(days=1)
+    elif day.weekday() == 6:
+        return day + datetime.timedelta(days=1)
+    return day
+
+
+def get_holidays(year):
+    """
+    Function returns NYSE full-day holidays of :year:.
+    Special closures (e.g. national days of mourning) are not included.
+    :return: list of dates
+    """
+    holidays = [
+        get_weekday(year, 2, 0, 3),  # Washington's Birthday
+        get_easter(year) - datetime.timedelta(days=2),  # Good Friday
+        get_weekday(year, 5, 0, -1),  # Memorial Day
+        get_observed(datetime.date(year, 7, 4)),
+        get_weekday(year, 9, 0, 1),  # Labor Day
+        get_weekday(year, 11, 3, 4),  # Thanksgiving
+        get_observed(datetime.date(year, 12, 25)),
+    ]
+    # New Year's Day on Saturday is not observed on Friday before
+    new_year = datetime.date(year, 1, 1)
+    if new_year.weekday() != 5:
+        holidays.append(get_observed(new_year))
+    if year >= 1998:
+        holidays.append(get_weekday(year, 1, 0, 3))  # Martin Luther King Jr. Day
+    if year >= 2022:
+        holidays.append(get_observed(datetime.date(year, 6, 19)))  # Juneteenth
+    return sorted(holidays)
+
+
+def to_days(dates):
+    return np.asarray(dates, dtype='datetime64[D]')
+
+
+class TradingCalendar:
+    """
+    :sessions: sorted array of all sessions (datetime64[D])
+    :counts: counts[i] - number of sessions on or before FIRST_DAY + i days
+    """
+    def __init__(self, first_day=FIRST_DAY, last_day=LAST_DAY):
+        self.first_day = first_day
+        self.last_day = last_day
+        holidays = [
+            holiday for year in range(first_day.year, last_day.year + 1)
+            for holiday in get_holidays(year)
+        ]
+        days = np.arange(to_days(first_day), to_days(last_day) + 1)
+        self.is_session = np.is_busday(days, holidays=to_days(holidays))
+        self.sessions = days[self.is_session]
+        self.counts = np.cumsum(self.is_session)
+
+    def get_offset(self, date):
+        if not self.first_day <= date <= self.last_day:
+            raise ValueError(f'{date} is out of trading calendar')
+        return (date - self.first_day).days
+
+    def is_trading_day(self, date):
+        return bool(self.is_session[self.get_offset(date)])
+
+    def previous_session(self, date, include=False):
+        """
+        :param include: True - :date: is returned if it is a session: bool
+        :return: the last session before (or on) :date:, None if there is
+        no such session in calendar
+        """
+        if date < self.first_day:
+            return None
+        if date > self.last_day:
+            index = len(self.sessions) - 1
+        else:
+            offset = self.get_offset(date)
+            index = self.counts[offset] - 1
+            if self.is_session[offset] and not include:
+                index -= 1
+        return self.sessions[index].item() if index >= 0 else None
+
+    def next_session(self, date, include=False):
+        """
+        :param include: True - :date: is returned if it is a session: bool
+        :return: the first session after (or on) :date:, None if there is
+        no such session in calendar
+        """
+        if date > self.last_day:
+            return None
+        if date < self.first_day:
+            index = 0
+        else:
+            offset = self.get_offset(date)
+            index = self.counts[offset]
+            if self.is_session[offset] and include:
+                index -= 1
+        return self.sessions[index].item() if index < len(self.sessions) else None
+
+    def sessions_ago(self, date, number):
+        # session :number: sessions before the last session on or before :date:
+        offset = self.get_offset(date)
+        return self.sessions[self.counts[offset] - 1 - number].item()
+
+    def count_sessions(self, start, end):
+        """
+        Method counts sessions in [start, end). Both arguments can be
+        dates or arrays of dates, then an array of counts is returned.
+        """
+        return self.count_before(end) - self.count_before(start)
+
+    def count_before(self, dates):
+        # number of sessions before :dates: (vectorized)
+        offsets = (to_days(dates) - to_days(self.first_day)).astype(int)
+        if np.any(offsets < 0) or np.any(offsets >= len(self.counts)):
+            raise ValueError('Dates are out of trading calendar')
+        return self.counts[offsets] - self.is_session[offsets]
+
+    def get_sessions(self, start, end):
+        # all sessions in [start, end] as list of dates
+        first = np.searchsorted(self.sessions, to_days(start), side='left')
+        last = np.searchsorted(self.sessions, to_days(end), side='right')
+        return self.sessions[first:last].tolist()
+
+
+calendar = TradingCalendar()
@@ -1,72 +1,97 @@
-import datetime
+import logging
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor, as_completed
 
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Max
 from django.utils import timezone
+from django.utils.dateparse import parse_date
 
-from .crawler import CompanyIEX, DividendsIEX, FinancialIEX, PastIEX, QuotesIEX
-from .models import Dividends, Financial, Prices, StockDetail, Stocks
-
+import requests
 
-def find_quote_day(date, num_days=0, type='earlier'):   # pragma: no cover
-    quote_day = date - timezone.timedelta(days=num_days)
+from .crawler import (
+    CompanyIEX, DividendsIEX, FinancialIEX, PastIEX, QuotesIEX, chunked,
+)
+from .models import Dividends, Financial, Prices, StockDetail, Stocks
+from .ratelimit import RateLimitExceeded
 
-    if type == 'earlier':
-        if quote_day.weekday() == 6:
-            quote_day -= timezone.timedelta(days=2)
-            return quote_day
-        return quote_day
 
-    elif type == 'later':
-        if quote_day.weekday() == 6:
-            quote_day -= datetime.timedelta(days=2)
-            return quote_day
-        quote_day -= datetime.timedelta(days=1)
-        return quote_day
+logger = logging.getLogger(__name__)
 
 
 class StockMaker:
+    # every add_* method can get already downloaded data from these crawlers
+    sources = {
+        'quotes': QuotesIEX,
+        'company': CompanyIEX,
+        'dividends': DividendsIEX,
+        'finances': FinancialIEX,
+        'prices': PastIEX,
+    }
 
-    def __init__(self, ticker):
+    def __init__(self, ticker, stock=None):
         self.ticker = ticker
+        self._stock = stock
 
-    def add_stocks(self):
+    @property
+    def stock(self):
+        # Stocks row is fetched only once for all add_* methods
+        if self._stock is None:
+            self._stock = Stocks.objects.get(ticker=self.ticker)
+        return self._stock
+
+    @staticmethod
+    def save_all(model, objs):
+        with transaction.atomic():
+            model.objects.bulk_create(objs, batch_size=settings.BULK_BATCH_SIZE)
+
+    def add_stocks(self, quotes=None):
         # use when you create new stock class
-        quotes = QuotesIEX(self.ticker).get_data()
+        if quotes is None:
+            quotes = QuotesIEX(self.ticker).get_data()
         data = {
             'name': quotes['companyName'],
             'ticker': quotes['symbol']
         }
-        Stocks.objects.create(
+        self._stock = Stocks.objects.create(
             name=data['name'],
             ticker=data['ticker']
         )
 
-    def add_detail(self):
+    def add_detail(self, data=None):
         # method create or update StockDetail
-        data = CompanyIEX(self.ticker).get_data()
+        if data is None:
+            data = CompanyIEX(self.ticker).get_data()
 
         StockDetail.objects.create(
-            stock=Stocks.objects.get(ticker=self.ticker),
+            stock=self.stock,
             sector=data.get('sector'),
             industry=data.get('industry'),
             website=data.get('website'),
             description=data.get('description')
         )
 
-    def add_dividends(self):
-        dividends = DividendsIEX(self.ticker).get_data()
-        for data in dividends:
-            Dividends.objects.create(
-                stock=Stocks.objects.get(ticker=self.ticker),
+    def add_dividends(self, dividends=None):
+        if dividends is None:
+            dividends = DividendsIEX(self.ticker).get_data()
+        objs = [
+            Dividends(
+                stock=self.stock,
                 payment=data.get('paymentDate') if data.get('paymentDate') else None,
                 record=data.get('recordDate') if data.get('recordDate') else None,
                 amount=data.get('amount') if data.get('amount') else None
             )
+            for data in dividends
+        ]
+        self.save_all(Dividends, objs)
 
-    def add_financial(self):
-        finances = FinancialIEX(self.ticker).get_data()
-        for finance in finances:
-            Financial.objects.create(
-                stock=Stocks.objects.get(ticker=self.ticker),
+    def add_financial(self, finances=None):
+        if finances is None:
+            finances = FinancialIEX(self.ticker).get_data()
+        objs = [
+            Financial(
+                stock=self.stock,
                 assets=finance.get('totalAssets') if finance.get('totalAssets') else None,
                 liabilities=finance.get('totalLiabilities') if finance.get('totalLiabilities') else None,
                 total_revenue=finance.get('totalRevenue') if finance.get('totalRevenue') else None,
@@ -74,25 +99,188 @@ class StockMaker:
                 operating_income=finance.get('operatingIncome') if finance.get('operatingIncome') else None,
                 net_income=finance.get('netIncome') if finance.get('netIncome') else None,
             )
+            for finance in finances
+        ]
+        self.save_all(Financial, objs)
 
-    def add_past_data(self):
+    def make_price(self, data):
+        return Prices(
+            stock=self.stock,
+            price=float(data['close']) if data.get('close') is not None else None,
+            date_price=parse_date(data.get('date')) if data.get('date') else None,
+            open=data.get('open') if data.get('open') else None,
+            volume=data.get('volume') if data.get('volume') else None,
+            change=data.get('change') if data.get('change') else None,
+            percent_change=data.get('changePercent') if data.get('changePercent') else None,
+        )
+
+    def get_price_chunks(self, prices=None, chart_range='5y'):
+        """
+        Method yields prices in lists of BULK_BATCH_SIZE elements.
+        :param prices: list of prices, file made by PastIEX.get_file or
+            None - prices are streamed from IEX
+        """
+        size = settings.BULK_BATCH_SIZE
+        if prices is None:
+            return PastIEX(self.ticker, chart_range).iter_chunks(size)
+        elif hasattr(prices, 'read'):
+            return PastIEX(self.ticker, chart_range).iter_chunks(size, file=prices)
+        return chunked(prices, size)
+
+    @transaction.atomic
+    def add_past_data(self, prices=None):
         # past prices of a Stocks' instance (last 5 years)
-        prices = PastIEX(self.ticker).get_data()
-        for data in prices:
-            Prices.objects.create(
-                stock=Stocks.objects.get(ticker=self.ticker),
-                price=float(data.get('close')),
-                date_price=data.get('date') if data.get('date') else None,
-                open=data.get('open') if data.get('open') else None,
-                volume=data.get('volume') if data.get('volume') else None,
-                change=data.get('change') if data.get('change') else None,
-                percent_change=data.get('changePercent') if data.get('changePercent') else None,
-            )
+        for chunk in self.get_price_chunks(prices):
+            objs = [self.make_price(data) for data in chunk]
+            Prices.objects.bulk_create(objs, batch_size=settings.BULK_BATCH_SIZE)
 
-    def add_all(self):  # pragma: no cover
-        self.add_stocks()
-        self.add_detail()
-        self.add_dividends()
-        self.add_financial()
-        self.add_past_data()
+    def sync_past_data(self, last_date=None):
+        """
+        Method downloads only prices which are missing since :last_date:
+        (the latest saved price by default). The shortest IEX chart range
+        which covers the gap is used. Response is downloaded to a file
+        before transaction is opened, like in add_many_stocks.
+        :param last_date: date of the last saved price: date
+        :return: number of saved prices: int
+        """
+        if last_date is None:
+            last_date = self.stock.past.aggregate(last=Max('date_price'))['last']
+        today = timezone.now().date()
+        if last_date is not None and last_date >= today:
+            return 0
+        crawler = PastIEX(self.ticker, PastIEX.get_range(last_date, today))
+        total = 0
+        with crawler.get_file() as file, transaction.atomic():
+            for chunk in crawler.iter_chunks(settings.BULK_BATCH_SIZE, file=file):
+                # bars without close (possible in short ranges) are synced later
+                objs = [
+                    self.make_price(data) for data in chunk
+                    if data.get('date') and data.get('close') is not None
+                ]
+                if last_date is not None:
+                    objs = [obj for obj in objs if obj.date_price > last_date]
+                if not objs:
+                    continue
+                first_date = min(obj.date_price for obj in objs)
+                existing = set(
+                    self.stock.past.filter(date_price__gte=first_date)
+                    .values_list('date_price', flat=True)
+                )
+                objs = [obj for obj in objs if obj.date_price not in existing]
+                Prices.objects.bulk_create(objs, batch_size=settings.BULK_BATCH_SIZE)
+                total += len(objs)
+        return total
+
+    @transaction.atomic
+    def add_all(self, quotes=None, company=None, dividends=None,
+                finances=None, prices=None):
+        self.add_stocks(quotes)
+        self.add_detail(company)
+        self.add_dividends(dividends)
+        self.add_financial(finances)
+        self.add_past_data(prices)
         print(f'data for {self.ticker} collected')
+
+
+def download(crawler, ticker):
+    if crawler is PastIEX:
+        # long history goes to a temporary file, it is decoded while saving
+        return PastIEX(ticker).get_file()
+    return crawler(ticker).get_data()
+
+
+def close_file(data):
+    # prices are downloaded to temporary files
+    if hasattr(data, 'close'):
+        data.close()
+
+
+def add_many_stocks(tickers, max_workers=None):
+    """
+    Function adds many new stocks at once. Every IEX request (quotes, company,
+    dividends, financials and prices for every ticker) goes to a thread pool
+    limited to :max_workers: threads. Data for a ticker is saved as soon as all
+    its requests are finished. Saving is done in the calling thread.
+    Tickers which already exist are skipped. Tickers stopped by rate limit
+    are returned apart from failed ones, so they can be added again later.
+    :param tickers: list of tickers
+    :param max_workers: max number of concurrent requests: int
+    :return: format {'added': [tickers], 'failed': [tickers],
+        'rate_limited': [tickers], 'retry_after': seconds}
+    """
+    max_workers = max_workers or settings.IEX_MAX_WORKERS
+    tickers = [ticker.upper() for ticker in tickers]
+    existing = set(Stocks.objects.filter(ticker__in=tickers).values_list('ticker', flat=True))
+    tickers = [ticker for ticker in dict.fromkeys(tickers) if ticker not in existing]
+    sources = StockMaker.sources
+    results = {'added': [], 'failed': [], 'rate_limited': [], 'retry_after': 0}
+    collected = defaultdict(dict)
+    pending = defaultdict(list)
+    failed = set()
+
+    def drop(ticker):
+        # requests of a failed ticker which have not started are cancelled
+        failed.add(ticker)
+        for future in pending.pop(ticker, []):
+            future.cancel()
+        for data in collected.pop(ticker, {}).values():
+            close_file(data)
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = {}
+        for ticker in tickers:
+            for name, crawler in sources.items():
+                future = executor.submit(download, crawler, ticker)
+                futures[future] = (ticker, name)
+                pending[ticker].append(future)
+
+        for future in as_completed(futures):
+            ticker, name = futures[future]
+            if ticker in failed:
+                if not future.cancelled() and future.exception() is None:
+                    close_file(future.result())
+                continue
+            try:
+                collected[ticker][name] = future.result()
+            except RateLimitExceeded as e:
+                logger.warning(f'Rate limit exceeded, {name} for {ticker} not downloaded')
+                drop(ticker)
+                results['rate_limited'].append(ticker)
+                results['retry_after'] = max(results['retry_after'], e.retry_after)
+                continue
+            except Exception:
+                logger.exception(f'Could not download {name} for {ticker}')
+                drop(ticker)
+                results['failed'].append(ticker)
+                continue
+            if len(collected[ticker]) < len(sources):
+                continue
+            pending.pop(ticker, None)
+            data = collected.pop(ticker)
+            try:
+                StockMaker(ticker).add_all(**data)
+            except Exception:
+                logger.exception(f'Could not save data for {ticker}')
+                failed.add(ticker)
+                results['failed'].append(ticker)
+            else:
+                results['added'].append(ticker)
+            finally:
+                data['prices'].close()
+    return results
+
+
+def sync_all_past_data():
+    """
+    Function downloads missing prices for all stocks. The latest price date
+    of every stock is read with one query.
+    :return: number of saved prices: int
+    """
+    total = 0
+    stocks = Stocks.objects.annotate(last_date=Max('past__date_price'))
+    for stock in stocks:
+        try:
+            total += StockMaker(stock.ticker, stock=stock).sync_past_data(stock.last_date)
+        except (TypeError, ValueError, requests.RequestException):
+            logger.exception(f'Could not sync prices for {stock.ticker}')
+    return total
@@ -3,7 +3,6 @@ import datetime
 
 from django.shortcuts import get_object_or_404
 
-from django.core.cache import cache
 from django.db.models import Q
 from django.http import HttpResponse, Http404
 from django.utils import timezone
@@ -12,9 +11,10 @@ from django.views.generic import CreateView, DetailView, ListView, TemplateView
 
 from openpyxl import Workbook
 
-from .crawler import GoogleCrawler, YahooCrawler
 from .models import Dividends, Prices, Stocks, Financial
-from .utils import find_quote_day
+from .news import get_news
+from .quotes import quote_store
+from .trading_calendar import calendar
 
 
 class CsvPrices(View):
@@ -58,15 +58,15 @@ class ExcelPrices(View):
 class SideBarMixin:
     """
     Class is responsible for adding data to sidebar. Subclass needs
-    to have self.kwargs['ticker']. Cache is used to get prices.
+    to have self.kwargs['ticker']. Quote store is used to get prices.
     """
     def get_context_data(self, *args, **kwargs):
         context = super().get_context_data(*args, **kwargs)
-        attributes = ['_price', '_day_change', '_percent_change']
+        attributes = ['price', 'day_change', 'percent_change']
         ticker = self.kwargs.get('ticker')
+        quote = quote_store.get(ticker)
         for attribute in attributes:
-            result = cache.get(ticker + attribute, 'no data')
-            context['stocks' + attribute] = result
+            context['stocks_' + attribute] = quote.get(attribute, 'no data')
         stock = Stocks.objects.get(ticker=ticker)
         context['side_stock'] = stock.name
         return context
@@ -79,7 +79,7 @@ class StocksListView(ListView):
     paginate_by = 10
 
     def get_queryset(self, *args):
-        queryset = super().get_queryset(*args)
+        queryset = super().get_queryset(*args).select_related('statistics')
         q = self.request.GET.get('q')
         if q:
             return queryset.filter(
@@ -90,14 +90,18 @@ class StocksListView(ListView):
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
+        # quotes of the whole page are read at once, template uses stock.quote
+        stocks = context['stocks']
+        quotes = quote_store.get_many(stock.ticker for stock in stocks)
+        for stock in stocks:
+            stock.quote = quotes[stock.ticker]
         today = timezone.now().date()
-        context['today'] = find_quote_day(today, 0, type='earlier')
-        best_stocks = Stocks.objects.highest_dividends()[:5]
+        context['today'] = calendar.previous_session(today)
+        best_stocks = Stocks.objects.highest_dividends(5)
         context['dividend_stocks'] = best_stocks
-        # sorted_stocks = sorted(Stocks.objects.all(), key=lambda stock: stock.perc_year_change)
-        sorted_stocks = Prices.objects.year_change()
-        context['rising'] = sorted_stocks[-5:]
-        context['falling'] = sorted_stocks[:5]
+        movers = Prices.objects.get_movers()
+        context['rising'] = movers['rising'][:5]
+        context['falling'] = movers['falling'][:5]
         return context
 
 
@@ -168,8 +172,9 @@ class StockView(FinancialChartMixin, SideBarMixin, ListView):
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         ticker = self.kwargs.get('ticker')
-        stock = Stocks.objects.get(ticker=ticker)
+        stock = Stocks.objects.select_related('statistics').get(ticker=ticker)
         context['stock'] = stock
+        context['statistics'] = getattr(stock, 'statistics', None)
         context['dividend_amount'] = stock.dividend_amount()
         context['dividend_rate'] = stock.dividend_rate()
         return context
@@ -180,9 +185,10 @@ class ArticlesView(SideBarMixin, TemplateView):
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        ticker = self.kwargs.get('ticker')
-        context['google_news'] = GoogleCrawler(ticker).get_data()
-        context['yahoo_news'] = YahooCrawler(ticker).get_data()
+        news = get_news(self.kwargs.get('ticker'))
+        context['google_news'] = news['google']
+        context['yahoo_news'] = news['yahoo']
+        context['news_updated'] = news['updated']
         return context
 
 